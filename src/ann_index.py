@@ -0,0 +1,325 @@
+# src/ann_index.py
+
+import os
+import sys
+import math
+import json
+import time
+import heapq
+import random
+import logging
+from array import array
+from operator import mul
+from src.config import (
+    ANN_N_LISTS,
+    ANN_N_PROBE,
+    ANN_KMEANS_ITERATIONS,
+    ANN_MIN_TRAIN_PER_LIST,
+    ANN_RETRAIN_GROWTH_FACTOR
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector) -> array:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return array('f', (x / norm for x in vector) if norm else vector)
+
+
+def _dot(a: list[float], b: list[float]) -> float:
+    return sum(map(mul, a, b))
+
+
+def exact_search(records: list[dict], query_vector: list[float], top_k: int = 5) -> list[dict]:
+    """
+    Brute-force cosine search over vector records ({"id", "values", "metadata"}).
+    Used as the ground truth when benchmarking the approximate index.
+    """
+    query = _normalize(query_vector)
+    scored = ((_dot(query, _normalize(r["values"])), r) for r in records)
+    return [
+        {"id": r["id"], "score": score, "metadata": r.get("metadata", {})}
+        for score, r in heapq.nlargest(top_k, scored, key=lambda item: item[0])
+    ]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index for cosine similarity.
+
+    Vectors are clustered with k-means into `n_lists` lists; a query only scans the
+    `n_probe` lists whose centroids are closest to it. Vectors added before the index
+    is trained are scanned exhaustively, and the index trains itself once it holds
+    `ANN_MIN_TRAIN_PER_LIST` vectors per list. Later inserts are assigned to their
+    nearest centroid, until the index has grown `ANN_RETRAIN_GROWTH_FACTOR` times past
+    its training size (or can fill lists it was trained without): it then retrains.
+    """
+
+    def __init__(self, n_lists: int = ANN_N_LISTS, n_probe: int = ANN_N_PROBE):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.ids = []
+        self.vectors = []  # Normalized float32 rows (array('f'))
+        self.metadata = []
+        self.centroids = []
+        self.lists = []  # Positions in `vectors`, per centroid
+        self.trained_size = 0  # Vectors in the index when it was last trained
+        self._positions = {}  # id -> position
+        self._assignments = []  # position -> index of the list holding it (trained indexes only)
+
+    @property
+    def is_trained(self) -> bool:
+        return bool(self.centroids)
+
+    @property
+    def needs_retraining(self) -> bool:
+        """
+        True when the clustering no longer reflects the data: the index has grown well
+        past its training size, or was trained with fewer lists than it can now fill.
+        """
+        if not self.is_trained:
+            return False
+        if len(self) >= ANN_RETRAIN_GROWTH_FACTOR * self.trained_size:
+            return True
+        return len(self.centroids) < self.n_lists and len(self) >= self.n_lists * ANN_MIN_TRAIN_PER_LIST
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _nearest_centroid(self, vector: list[float]) -> int:
+        return max(range(len(self.centroids)), key=lambda c: _dot(vector, self.centroids[c]))
+
+    def train(self, iterations: int = ANN_KMEANS_ITERATIONS, seed: int = 0):
+        """
+        Clusters the vectors currently in the index (spherical k-means) and rebuilds the lists.
+        """
+        n_lists = min(self.n_lists, len(self.vectors))
+        if n_lists == 0:
+            raise ValueError("Cannot train an empty index.")
+
+        rng = random.Random(seed)
+        centroids = [list(self.vectors[i]) for i in rng.sample(range(len(self.vectors)), n_lists)]
+        self.centroids = centroids
+        rounds = 0
+        for _ in range(iterations):
+            rounds += 1
+            assignments = [self._nearest_centroid(v) for v in self.vectors]
+            sums = [[0.0] * len(self.vectors[0]) for _ in range(n_lists)]
+            counts = [0] * n_lists
+            for vector, c in zip(self.vectors, assignments):
+                counts[c] += 1
+                sums[c] = [a + b for a, b in zip(sums[c], vector)]
+            moved = False
+            for c in range(n_lists):
+                if counts[c] == 0:
+                    # Re-seed empty clusters on a random vector
+                    new_centroid = list(self.vectors[rng.randrange(len(self.vectors))])
+                else:
+                    new_centroid = _normalize(sums[c]).tolist()
+                if new_centroid != self.centroids[c]:
+                    moved = True
+                self.centroids[c] = new_centroid
+            if not moved:
+                break
+
+        self.lists = [[] for _ in range(n_lists)]
+        self._assignments = []
+        for position, vector in enumerate(self.vectors):
+            c = self._nearest_centroid(vector)
+            self.lists[c].append(position)
+            self._assignments.append(c)
+        self.trained_size = len(self.vectors)
+        logger.info(f"Trained IVF index: {len(self.vectors)} vectors in {n_lists} lists ({rounds} iterations).")
+
+    def add(self, records: list[dict]):
+        """
+        Inserts vector records ({"id", "values", "metadata"}); existing ids are replaced.
+        """
+        for record in records:
+            vector = _normalize(record["values"])
+            position = self._positions.get(record["id"])
+            if position is None:
+                position = len(self.ids)
+                self._positions[record["id"]] = position
+                self.ids.append(record["id"])
+                self.vectors.append(vector)
+                self.metadata.append(record.get("metadata", {}))
+                if self.is_trained:
+                    self._assignments.append(-1)
+            else:
+                self.vectors[position] = vector
+                self.metadata[position] = record.get("metadata", {})
+                if self.is_trained:
+                    self.lists[self._assignments[position]].remove(position)
+            if self.is_trained:
+                c = self._nearest_centroid(vector)
+                self.lists[c].append(position)
+                self._assignments[position] = c
+
+        if not self.is_trained and len(self.vectors) >= self.n_lists * ANN_MIN_TRAIN_PER_LIST:
+            self.train()
+        elif self.needs_retraining:
+            logger.info(f"IVF index grew from {self.trained_size} to {len(self)} vectors. Retraining.")
+            self.train()
+
+    def remove(self, ids: list[str]):
+        """
+        Deletes vectors by id; unknown ids are ignored. The last vector is moved into
+        each freed position so that positions stay contiguous.
+        """
+        for _id in ids:
+            position = self._positions.pop(_id, None)
+            if position is None:
+                continue
+            last = len(self.ids) - 1
+            if self.is_trained:
+                self.lists[self._assignments[position]].remove(position)
+                if position != last:
+                    members = self.lists[self._assignments[last]]
+                    members[members.index(last)] = position
+                    self._assignments[position] = self._assignments[last]
+                self._assignments.pop()
+            if position != last:
+                self.ids[position] = self.ids[last]
+                self.vectors[position] = self.vectors[last]
+                self.metadata[position] = self.metadata[last]
+                self._positions[self.ids[position]] = position
+            self.ids.pop()
+            self.vectors.pop()
+            self.metadata.pop()
+
+    def sync(self, records: list[dict]) -> tuple[int, int]:
+        """
+        Makes the index hold exactly `records`: ids missing from them are removed, and
+        only records that are new or whose metadata changed are (re-)inserted.
+        Returns the number of records inserted and of ids removed.
+        """
+        wanted = {record["id"]: record for record in records}
+        stale = [_id for _id in self.ids if _id not in wanted]
+        self.remove(stale)
+        changed = [
+            record for _id, record in wanted.items()
+            if _id not in self._positions or self.metadata[self._positions[_id]] != record.get("metadata", {})
+        ]
+        self.add(changed)
+        return len(changed), len(stale)
+
+    def search(self, query_vector: list[float], top_k: int = 5, n_probe: int = None) -> list[dict]:
+        """
+        Returns the approximate `top_k` matches as {"id", "score", "metadata"}, best first.
+        Larger `n_probe` values scan more lists: higher recall, higher latency.
+        """
+        query = _normalize(query_vector)
+        if self.is_trained:
+            n_probe = min(n_probe or self.n_probe, len(self.centroids))
+            probed = heapq.nlargest(n_probe, range(len(self.centroids)), key=lambda c: _dot(query, self.centroids[c]))
+            candidates = [position for c in probed for position in self.lists[c]]
+        else:
+            candidates = range(len(self.vectors))
+
+        best = heapq.nlargest(top_k, ((_dot(query, self.vectors[p]), p) for p in candidates))
+        return [{"id": self.ids[p], "score": score, "metadata": self.metadata[p]} for score, p in best]
+
+    def save(self, path: str):
+        """
+        Persists the index to a JSON header at `path` and its vectors and centroids,
+        as float32, to a binary file next to it (both written atomically).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        dimension = len(self.vectors[0]) if self.vectors else (len(self.centroids[0]) if self.centroids else 0)
+        values = array('f')
+        for vector in self.vectors:
+            values.extend(vector)
+        for centroid in self.centroids:
+            values.extend(centroid)
+
+        vectors_path = _vectors_path(path)
+        with open(f"{vectors_path}.tmp", 'wb') as f:
+            values.tofile(f)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "dimension": dimension,
+                "byteorder": sys.byteorder,
+                "vectors_file": os.path.basename(vectors_path),
+                "n_centroids": len(self.centroids),
+                "trained_size": self.trained_size,
+                "ids": self.ids,
+                "metadata": self.metadata,
+                "lists": self.lists
+            }, f)
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Saved IVF index with {len(self)} vectors to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """
+        Loads an index saved with `save`.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(n_lists=data["n_lists"], n_probe=data["n_probe"])
+        index.ids = data["ids"]
+        index.metadata = data["metadata"]
+        index.lists = data["lists"]
+
+        if "vectors" in data:
+            # Indexes saved before vectors moved to a binary file
+            index.vectors = [array('f', vector) for vector in data["vectors"]]
+            index.centroids = data["centroids"]
+        elif data["dimension"] == 0:
+            index.vectors, index.centroids = [], []  # Saved while empty
+        else:
+            values = array('f')
+            with open(os.path.join(os.path.dirname(path), data["vectors_file"]), 'rb') as f:
+                values.frombytes(f.read())
+            if data["byteorder"] != sys.byteorder:
+                values.byteswap()
+            dimension = data["dimension"]
+            rows = [values[i:i + dimension] for i in range(0, len(values), dimension)]
+            if len(rows) != len(index.ids) + data["n_centroids"]:
+                raise ValueError(f"Vector file of {path} holds {len(rows)} vectors, expected {len(index.ids) + data['n_centroids']}.")
+            index.vectors = rows[:len(index.ids)]
+            index.centroids = [row.tolist() for row in rows[len(index.ids):]]
+        index.trained_size = data.get("trained_size", len(index.ids) if index.centroids else 0)
+        index._positions = {_id: position for position, _id in enumerate(index.ids)}
+        if index.centroids:
+            index._assignments = [-1] * len(index.ids)
+            for c, members in enumerate(index.lists):
+                for position in members:
+                    index._assignments[position] = c
+        logger.info(f"Loaded IVF index with {len(index)} vectors from {path}")
+        return index
+
+
+def _vectors_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}.f32"
+
+
+def benchmark(index: IVFIndex, records: list[dict], queries: list[list[float]], top_k: int = 5,
+              n_probes: list[int] = None) -> list[dict]:
+    """
+    Measures recall@top_k and mean query latency of the index against exact search,
+    for each `n_probe` setting.
+    """
+    started = time.perf_counter()
+    truth = [set(m["id"] for m in exact_search(records, q, top_k)) for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+
+    results = []
+    for n_probe in n_probes or [1, 2, 4, 8, 16]:
+        hits = 0
+        started = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            hits += len(expected & set(m["id"] for m in index.search(query, top_k, n_probe)))
+        latency_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+        results.append({
+            "n_probe": n_probe,
+            "recall": hits / max(sum(len(t) for t in truth), 1),
+            "latency_ms": latency_ms,
+            "exact_latency_ms": exact_ms
+        })
+    return results
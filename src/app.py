@@ -1,9 +1,11 @@
 # main Flask app file
 
+import math
 import logging
 from flask import Flask, request, jsonify, send_from_directory
-from src.query_engine import generate_ai_response
-from src.config import GEMINI_API_KEY
+from src.query_engine import generate_ai_response, SchedulerOverloaded
+from src.resilience import DeadlineExceeded, metrics_snapshot
+from src.config import GEMINI_API_KEY, LLM_PRIORITY_LEVELS
 from src.download_data import download_if_needed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,10 +34,24 @@ def handle_query():
     else:
         logger.info("Received query request with history (last message not a user query).")
 
+    # Clients may only lower the priority of their own requests (e.g. background jobs);
+    # 0, the default, is the most urgent level.
+    priority = data.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return jsonify({"error": "'priority' must be an integer"}), 400
+    priority = min(max(priority, 0), LLM_PRIORITY_LEVELS - 1)
+
     try:
-        response_text = generate_ai_response(conversation_history)
+        response_text = generate_ai_response(conversation_history, priority=priority)
         logger.info("Successfully generated AI response.")
         return jsonify({"response": response_text})
+    except SchedulerOverloaded as so:
+        response = jsonify({"error": "The server is busy. Please retry shortly."})
+        response.headers['Retry-After'] = str(math.ceil(so.retry_after))
+        return response, 429
+    except DeadlineExceeded as de:
+        logger.error(f"AI response generation timed out: {de}")
+        return jsonify({"error": "The model took too long to respond. Please try again."}), 504
     except ValueError as ve:
         logger.error(f"Configuration error during AI response generation: {ve}", exc_info=True)
         return jsonify({"error": f"Configuration error: {ve}. Please check server setup."}), 500
@@ -43,6 +59,10 @@ def handle_query():
         logger.error(f"An unexpected error occurred during AI response generation: {e}", exc_info=True)
         return jsonify({"error": f"An internal server error occurred: {e}"}), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def handle_metrics():
+    return jsonify(metrics_snapshot())
+
 def main():
     logger.info("Checking data availability...")
     download_if_needed()
@@ -0,0 +1,274 @@
+# src/chunking.py
+
+import math
+import logging
+from src.config import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_MIN_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    MMR_LAMBDA,
+    MMR_DUPLICATE_THRESHOLD
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the token count of a text (~4 characters per token for English prose).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def _split_words(words: list[str], max_tokens: int, overlap_tokens: int) -> list[list[str]]:
+    """
+    Splits a list of words into windows of at most `max_tokens` tokens,
+    each window repeating the trailing `overlap_tokens` tokens of the previous one.
+    Tokens are estimated over the characters of the whole window, as in `estimate_tokens`.
+    """
+    max_chars = max_tokens * 4
+    overlap_chars = overlap_tokens * 4
+    windows = []
+    start = 0
+    while start < len(words):
+        end = start + 1
+        chars = len(words[start])
+        while end < len(words) and chars + 1 + len(words[end]) <= max_chars:
+            chars += 1 + len(words[end])
+            end += 1
+        windows.append(words[start:end])
+        if end >= len(words):
+            break
+
+        # Step back over the overlap, always making progress
+        overlap_start = end
+        overlap = 0
+        while overlap_start > start + 1 and overlap + len(words[overlap_start - 1]) + 1 <= overlap_chars:
+            overlap += len(words[overlap_start - 1]) + 1
+            overlap_start -= 1
+        start = overlap_start
+    return windows
+
+
+def chunk_report(
+    report_name: str,
+    report_date: str,
+    content: list[dict],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS
+) -> list[dict]:
+    """
+    Splits the paragraphs of a report into token-bounded chunks ready for embedding.
+
+    Long paragraphs are split into overlapping windows; consecutive short paragraphs
+    are merged until they reach `min_tokens`. Each chunk's `text` is prefixed with its
+    paragraph title. Chunk ids ("<report>-<paragraph>-<chunk>") are stable across runs
+    as long as the report content does not change.
+    """
+    chunks = []
+    pending = []  # Short paragraphs waiting to be merged: (index, title, text)
+
+    def _flush_pending():
+        if not pending:
+            return
+        first_index = pending[0][0]
+        title = pending[0][1]
+        text = "\n\n".join(
+            text if i == first_index or not t else f"{t}\n{text}"
+            for i, t, text in pending
+        )
+        chunks.append(_make_chunk(report_name, report_date, first_index, 0, 1, title, text,
+                                  last_paragraph_index=pending[-1][0]))
+        pending.clear()
+
+    for i, paragraph in enumerate(content):
+        paragraph_text = paragraph.get("paragraph", "").strip()
+        paragraph_title = paragraph.get("title", "")
+        if not paragraph_text:
+            logger.debug(f"Skipping empty paragraph in {report_name} (index {i}).")
+            continue
+
+        tokens = estimate_tokens(paragraph_text)
+        if tokens < min_tokens:
+            pending.append((i, paragraph_title, paragraph_text))
+            if sum(estimate_tokens(text) for _, _, text in pending) >= min_tokens:
+                _flush_pending()
+            continue
+
+        _flush_pending()
+        prefix = f"{paragraph_title}\n\n" if paragraph_title else ""
+        if estimate_tokens(prefix + paragraph_text) <= max_tokens:
+            chunks.append(_make_chunk(report_name, report_date, i, 0, 1, paragraph_title, paragraph_text))
+            continue
+
+        # Leave room for the title prefix repeated on every window
+        window_tokens = max(max_tokens - estimate_tokens(prefix), overlap_tokens + 1)
+        windows = _split_words(paragraph_text.split(), window_tokens, overlap_tokens)
+        for j, window in enumerate(windows):
+            chunks.append(_make_chunk(report_name, report_date, i, j, len(windows), paragraph_title, " ".join(window)))
+
+    _flush_pending()
+    return chunks
+
+
+def _make_chunk(
+    report_name: str,
+    report_date: str,
+    paragraph_index: int,
+    chunk_index: int,
+    chunk_count: int,
+    title: str,
+    text: str,
+    last_paragraph_index: int = None
+) -> dict:
+    prefixed = f"{title}\n\n{text}" if title else text
+    return {
+        "id": f"{report_name}-{paragraph_index}-{chunk_index}",
+        "text": prefixed,
+        "metadata": {
+            "report_date": report_date,
+            "report_name": report_name,
+            "paragraph_title": title,
+            "paragraph_text": text,
+            "paragraph_index": paragraph_index,
+            "last_paragraph_index": paragraph_index if last_paragraph_index is None else last_paragraph_index,
+            "chunk_index": chunk_index,
+            "chunk_count": chunk_count,
+            "token_count": estimate_tokens(prefixed)
+        }
+    }
+
+
+# --- Query-side context packing ---
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _join_overlapping(left: str, right: str) -> str:
+    """
+    Joins two consecutive windows of the same paragraph, dropping the words they share.
+    """
+    left_words = left.split()
+    right_words = right.split()
+    for size in range(min(len(left_words), len(right_words)), 0, -1):
+        if left_words[-size:] == right_words[:size]:
+            return " ".join(left_words + right_words[size:])
+    return f"{left}\n\n{right}"
+
+
+def pack_context(
+    matches: list[dict],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    mmr_lambda: float = MMR_LAMBDA,
+    duplicate_threshold: float = MMR_DUPLICATE_THRESHOLD
+) -> list[dict]:
+    """
+    Packs ranked retrieval matches into a token budget.
+
+    Matches are dicts with "id", "score", "metadata" (as written by `chunk_report`)
+    and optionally "values". Chunks are picked by maximal marginal relevance so that
+    near-duplicates (cosine >= `duplicate_threshold`) are dropped, then adjacent chunks
+    of the same report are merged into a single block. Returns the blocks ordered by
+    their best score.
+    """
+    candidates = [m for m in matches if m.get("metadata")]
+    selected = []
+    used_tokens = 0
+
+    while candidates:
+        best, best_mmr, best_redundancy = None, None, 0.0
+        for candidate in candidates:
+            redundancy = 0.0
+            if candidate.get("values"):
+                redundancy = max(
+                    (_cosine(candidate["values"], s["values"]) for s in selected if s.get("values")),
+                    default=0.0
+                )
+            mmr = mmr_lambda * candidate.get("score", 0.0) - (1 - mmr_lambda) * redundancy
+            if best_mmr is None or mmr > best_mmr:
+                best, best_mmr, best_redundancy = candidate, mmr, redundancy
+        candidates.remove(best)
+
+        if best_redundancy >= duplicate_threshold:
+            logger.debug(f"Dropping near-duplicate chunk {best['id']} (similarity {best_redundancy:.3f}).")
+            continue
+        tokens = best["metadata"].get("token_count") or estimate_tokens(best["metadata"].get("paragraph_text", ""))
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append(best)
+        used_tokens += tokens
+
+    return _merge_adjacent(selected)
+
+
+def _merge_adjacent(selected: list[dict]) -> list[dict]:
+    def _position(match):
+        metadata = match["metadata"]
+        return (metadata.get("report_name", ""),
+                int(metadata.get("paragraph_index", 0)),
+                int(metadata.get("chunk_index", 0)))
+
+    blocks = []
+    for match in sorted(selected, key=_position):
+        metadata = match["metadata"]
+        report_name, paragraph_index, chunk_index = _position(match)
+        last_index = int(metadata.get("last_paragraph_index", paragraph_index))
+        chunk_count = int(metadata.get("chunk_count", 1))
+        block = blocks[-1] if blocks else None
+
+        if block and block["report_name"] == report_name:
+            if paragraph_index == block["_paragraph_index"] and chunk_index == block["_chunk_index"] + 1:
+                block["text"] = _join_overlapping(block["text"], metadata.get("paragraph_text", ""))
+                block["_chunk_index"] = chunk_index
+                block["ids"].append(match["id"])
+                block["score"] = max(block["score"], match.get("score", 0.0))
+                continue
+            block_complete = block["_chunk_index"] == block["_chunk_count"] - 1
+            if paragraph_index == block["_last_paragraph_index"] + 1 and chunk_index == 0 and block_complete:
+                title = metadata.get("paragraph_title", "")
+                text = metadata.get("paragraph_text", "")
+                block["text"] += f"\n\n{title}\n{text}" if title else f"\n\n{text}"
+                block["_paragraph_index"] = paragraph_index
+                block["_last_paragraph_index"] = last_index
+                block["_chunk_index"] = chunk_index
+                block["_chunk_count"] = chunk_count
+                block["ids"].append(match["id"])
+                block["score"] = max(block["score"], match.get("score", 0.0))
+                continue
+
+        blocks.append({
+            "report_name": report_name,
+            "report_date": metadata.get("report_date"),
+            "title": metadata.get("paragraph_title", ""),
+            "text": metadata.get("paragraph_text", ""),
+            "ids": [match["id"]],
+            "score": match.get("score", 0.0),
+            "_paragraph_index": paragraph_index,
+            "_last_paragraph_index": last_index,
+            "_chunk_index": chunk_index,
+            "_chunk_count": chunk_count
+        })
+
+    for block in blocks:
+        for key in ("_paragraph_index", "_last_paragraph_index", "_chunk_index", "_chunk_count"):
+            del block[key]
+    return sorted(blocks, key=lambda b: b["score"], reverse=True)
+
+
+def format_context(blocks: list[dict]) -> str:
+    """
+    Renders packed context blocks as Markdown for inclusion in a prompt.
+    """
+    sections = []
+    for block in blocks:
+        header = f"### {block['report_name']} ({block['report_date']})"
+        if block["title"]:
+            header += f" - {block['title']}"
+        sections.append(f"{header}\n{block['text']}")
+    return "\n\n".join(sections)
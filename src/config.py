@@ -19,6 +19,26 @@ SUPABASE_S3_BUCKET_NAME = os.getenv("SUPABASE_S3_BUCKET_NAME")
 # --- LLM and Embedding Models ---
 DEFAULT_EMBEDDING_MODEL = "gemini-embedding-exp-03-07"  # As per gen_embed.py
 DEFAULT_LLM_MODEL = 'gemini-2.5-flash-preview-05-20'    # As per run_cli.py
+EMBEDDING_REQUEST_DELAY_SECONDS = 6  # Pause between embedding calls to respect API rate limits
+
+# --- LLM Request Scheduling ---
+LLM_MAX_CONCURRENCY = 4  # Max simultaneous generate_content calls
+LLM_TOKENS_PER_MINUTE = 250000  # Token-rate budget shared by all generate_content calls
+LLM_MAX_QUEUE_SIZE = 32  # Requests waiting beyond this are rejected with 429
+LLM_MAX_OUTPUT_TOKENS = 2048
+LLM_PRIORITY_LEVELS = 3  # Client priorities are clamped to 0 (default, served first) .. LLM_PRIORITY_LEVELS - 1
+
+# --- Model Call Deadlines, Retries and Hedging ---
+LLM_CALL_DEADLINE_SECONDS = 90  # Total budget for a generate_content call, retries included
+LLM_ATTEMPT_TIMEOUT_SECONDS = 60
+EMBEDDING_CALL_DEADLINE_SECONDS = 20
+EMBEDDING_ATTEMPT_TIMEOUT_SECONDS = 8
+CALL_MAX_ATTEMPTS = 4
+CALL_BACKOFF_BASE_SECONDS = 0.5  # Backoff doubles per retry, with full jitter
+CALL_BACKOFF_MAX_SECONDS = 8
+HEDGE_MIN_DELAY_SECONDS = 0.5  # Hedges are sent after max(p95 latency, this delay)
+HEDGE_MIN_SAMPLES = 20  # Latency samples needed before the p95 is trusted
+LATENCY_WINDOW_SIZE = 500  # Recent latencies kept per kind of call
 
 # --- Pinecone Constants ---
 EMBED_DIM = 3072  # As per vector_db.py
@@ -27,14 +47,53 @@ NAMESPACE = "example-namespace"  # As per vector_db.py
 PINECONE_CLOUD = 'aws'  # Default from vector_db.py
 PINECONE_REGION = 'us-east-1'  # Default from vector_db.py
 PINECONE_BATCH_SIZE = 100  # Default from vector_db.py
+SHARD_BY = "report_type"  # Split NAMESPACE into shards by "report_type", "company" or "period"; None for a single namespace
+SHARD_QUERY_MAX_WORKERS = 32  # Cap on concurrent queries in one fan-out (shards x query vectors)
+SHARD_LIST_TTL_SECONDS = 300  # How long the list of shard namespaces is reused before asking Pinecone again
+RRF_K = 60  # Reciprocal rank fusion constant for multi-query fan-out
+
+# --- Local Approximate Nearest-Neighbour Index ---
+ANN_INDEX_PATH = "/home/eolus/workspace/research-portal/data/embeddings/ivf_index.json"
+ANN_N_LISTS = 32  # k-means clusters (inverted lists)
+ANN_N_PROBE = 4  # Lists scanned per query; higher means better recall, slower queries
+ANN_KMEANS_ITERATIONS = 10
+ANN_MIN_TRAIN_PER_LIST = 8  # Vectors per list needed before the index trains itself
+ANN_RETRAIN_GROWTH_FACTOR = 2  # Retrain once the index holds this many times the vectors it was trained on
 
 # --- Data Directories ---
+REPORTS_PDF_DIR = "/home/eolus/workspace/research-portal/data/reports/PDF"
 REPORTS_JSON_DIR = "/home/eolus/workspace/research-portal/data/reports/JSON"
 EMBEDDINGS_REPORTS_DIR = "/home/eolus/workspace/research-portal/data/embeddings/reports"
 EMBEDDINGS_QUESTIONS_DIR = "/home/eolus/workspace/research-portal/data/embeddings/questions"
 QUESTIONS_JSON_PATH = "/home/eolus/workspace/research-portal/data/questions/questions_v0.json"
 
+# --- Chunking and Context Packing ---
+CHUNK_MAX_TOKENS = 400  # Longer paragraphs are split into overlapping chunks
+CHUNK_OVERLAP_TOKENS = 50  # Tokens repeated between consecutive chunks of a paragraph
+CHUNK_MIN_TOKENS = 40  # Shorter consecutive paragraphs are merged into one chunk
+CONTEXT_TOKEN_BUDGET = 2000  # Max tokens of retrieved context packed into a prompt
+MMR_LAMBDA = 0.7  # Relevance vs. diversity trade-off when packing context
+MMR_DUPLICATE_THRESHOLD = 0.95  # Chunks this similar to an already packed one are dropped
+
+# --- Near-Duplicate Detection ---
+DEDUP_THRESHOLD = 0.8  # Paragraphs at least this similar (Jaccard) to an earlier one are not embedded
+DEDUP_NUM_PERM = 128  # MinHash signature length
+DEDUP_SHINGLE_SIZE = 5  # Characters per shingle
+
+# --- PDF Extraction ---
+PDF_EXTRACTION_WORKERS = 4  # Concurrent extraction calls to the LLM
+PDF_PAGES_PER_CHUNK = 10  # Larger PDFs are split into page ranges of this size
+PDF_EXTRACTION_TIMEOUT_SECONDS = 300  # Per extraction call; a hung call would otherwise hold a worker forever
+
+# --- Currency Conversion ---
+FX_API_URL = "https://api.frankfurter.dev/v1/latest"
+FX_CACHE_TTL_SECONDS = 3600  # Rates are published daily; refetch at most hourly
+FX_REQUEST_TIMEOUT_SECONDS = 5
+FX_POOL_SIZE = 4  # Pooled HTTP connections to the FX API
+FX_FAILURE_BACKOFF_SECONDS = 60  # Wait this long after a failed fetch before trying again
+
 # --- Tool-specific configurations ---
+REPORT_READ_MAX_BYTES = 16000  # Cap on report section data returned per tool call (~4000 tokens)
 ALLOWED_REPORT_FILES = [
     "company_report_HPG.json",
     "company_report_VHC.json",
@@ -0,0 +1,118 @@
+# src/dedup.py
+
+import re
+import zlib
+import random
+import logging
+from src.config import (
+    DEDUP_THRESHOLD,
+    DEDUP_NUM_PERM,
+    DEDUP_SHINGLE_SIZE
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _shingles(text: str, size: int) -> set[int]:
+    """
+    Hashes the overlapping character n-grams of a normalized text.
+    Character shingles keep small wording changes from dominating the similarity.
+    """
+    normalized = " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+    if len(normalized) <= size:
+        return {zlib.crc32(normalized.encode('utf-8'))}
+    return {zlib.crc32(normalized[i:i + size].encode('utf-8')) for i in range(len(normalized) - size + 1)}
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    Picks the (bands, rows) split of the signature with the highest LSH threshold
+    (1/b)^(1/r) not above the requested similarity, favouring recall; candidate
+    pairs are then verified against the full signature.
+    """
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [br for br in candidates if (1 / br[0]) ** (1 / br[1]) <= threshold]
+    return max(below or candidates[:1], key=lambda br: (1 / br[0]) ** (1 / br[1]))
+
+
+class NearDuplicateDetector:
+    """
+    Detects near-duplicate texts with MinHash signatures and LSH banding.
+
+    Texts are registered in order; a text whose estimated Jaccard similarity
+    (over character shingles) with an earlier one reaches `threshold` is reported as a
+    duplicate of that earlier, canonical text.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        seed: int = 1
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._buckets = [{} for _ in range(self.bands)]  # Per band: band hash -> keys
+        self._signatures = {}  # key -> signature
+        self.seen = 0
+        self.duplicates = 0
+
+    def signature(self, text: str) -> list[int]:
+        shingles = _shingles(text, self.shingle_size)
+        return [
+            min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles)
+            for a, b in self._permutations
+        ]
+
+    def _similarity(self, sig_a: list[int], sig_b: list[int]) -> float:
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.num_perm
+
+    def check(self, key: str, text: str) -> str | None:
+        """
+        Returns the key of the canonical text that `text` duplicates, or registers
+        `text` under `key` as a new canonical text and returns None.
+        """
+        self.seen += 1
+        signature = self.signature(text)
+        bands = [
+            hash(tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+        candidates = set()
+        for band, band_hash in enumerate(bands):
+            candidates.update(self._buckets[band].get(band_hash, ()))
+        best_key, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = self._similarity(signature, self._signatures[candidate])
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_key, best_similarity = candidate, similarity
+        if best_key is not None:
+            self.duplicates += 1
+            logger.debug(f"'{key}' is a near-duplicate of '{best_key}' (similarity {best_similarity:.2f}).")
+            return best_key
+
+        self._signatures[key] = signature
+        for band, band_hash in enumerate(bands):
+            self._buckets[band].setdefault(band_hash, []).append(key)
+        return None
+
+    def summary(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "paragraphs": self.seen,
+            "duplicates": self.duplicates,
+            "duplicate_ratio": self.duplicates / self.seen if self.seen else 0.0
+        }
@@ -4,6 +4,7 @@ import boto3
 from botocore.config import Config
 import os
 from pathlib import Path
+from src.report_index import index_reports
 from src.config import (
     SUPABASE_S3_ENDPOINT_URL,
     SUPABASE_S3_REGION_NAME,
@@ -53,3 +54,4 @@ def download_if_needed():
             print(f"Failed to download {key}: {e}")
 
     print("All files downloaded to 'downloads/'")
+    print(f"Indexed sections of {index_reports(str(DOWNLOAD_DIR))} reports.")
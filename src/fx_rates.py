@@ -0,0 +1,177 @@
+# src/fx_rates.py
+
+import time
+import logging
+import threading
+from typing import Callable
+import requests
+from requests.adapters import HTTPAdapter
+from src.config import (
+    FX_API_URL,
+    FX_CACHE_TTL_SECONDS,
+    FX_REQUEST_TIMEOUT_SECONDS,
+    FX_POOL_SIZE,
+    FX_FAILURE_BACKOFF_SECONDS
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+REFERENCE_CURRENCY = "EUR"  # Frankfurter publishes ECB reference rates against EUR
+
+
+class FxRateError(Exception):
+    """Raised when exchange rates cannot be fetched or a currency is unknown."""
+
+
+class FxRateClient:
+    """
+    Currency converter backed by a TTL cache of exchange rates.
+
+    All rates are fetched against a single reference currency in one request, so any
+    currency pair (and any number of conversions) is served from the same cached
+    snapshot. The default upstream (Frankfurter) only serves the ECB reference
+    currencies (USD, JPY, GBP, CNY, KRW, THB, ... but not VND); `fetch` may be replaced
+    by any callable returning `(date, {currency: rate_vs_reference})`, e.g. a source
+    covering more currencies or a stub to run without network access.
+
+    Only one thread fetches at a time, outside the cache lock: while it does, other
+    callers are served the previous rates. After a failed fetch, no new fetch is
+    attempted for `failure_backoff` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], tuple[str, dict[str, float]]] = None,
+        ttl_seconds: float = FX_CACHE_TTL_SECONDS,
+        api_url: str = FX_API_URL,
+        timeout: float = FX_REQUEST_TIMEOUT_SECONDS,
+        failure_backoff: float = FX_FAILURE_BACKOFF_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.api_url = api_url
+        self.timeout = timeout
+        self.failure_backoff = failure_backoff
+        self._fetch = fetch or self._fetch_latest
+        self._session = None
+        self._lock = threading.Lock()  # Guards the cached snapshot
+        self._refresh_lock = threading.Lock()  # Held by the single thread fetching new rates
+        self._rates = None
+        self._date = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._last_error = None
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FX_POOL_SIZE, pool_maxsize=FX_POOL_SIZE, max_retries=2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    def _fetch_latest(self) -> tuple[str, dict[str, float]]:
+        response = self._get_session().get(
+            self.api_url,
+            params={"base": REFERENCE_CURRENCY},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data["date"], data["rates"]
+
+    def _cached(self) -> tuple[str, dict[str, float]] | None:
+        """
+        Returns the cached snapshot if no fetch is due, raising the last error when
+        there is no snapshot and the previous fetch failed recently.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._rates is not None and now - self._fetched_at <= self.ttl_seconds:
+                return self._date, self._rates
+            if self._failed_at is not None and now - self._failed_at < self.failure_backoff:
+                if self._rates is None:
+                    raise FxRateError(f"Failed to fetch exchange rates: {self._last_error}")
+                return self._date, self._rates
+            return None
+
+    def get_rates(self) -> tuple[str, dict[str, float]]:
+        """
+        Returns `(date, rates)` against the reference currency, refetching when the cache has expired.
+        """
+        cached = self._cached()
+        if cached is not None:
+            return cached
+
+        # Callers with a previous snapshot don't wait for another thread's fetch
+        if not self._refresh_lock.acquire(blocking=self._rates is None):
+            return self._date, self._rates
+        try:
+            cached = self._cached()  # Another thread may have fetched meanwhile
+            if cached is not None:
+                return cached
+            try:
+                date, rates = self._fetch()
+            except Exception as e:
+                with self._lock:
+                    self._failed_at = time.monotonic()
+                    self._last_error = e
+                    if self._rates is None:
+                        raise FxRateError(f"Failed to fetch exchange rates: {e}") from e
+                    logger.warning(f"Failed to refresh exchange rates, serving rates from {self._date}: {e}")
+                    return self._date, self._rates
+
+            with self._lock:
+                self._rates = {**rates, REFERENCE_CURRENCY: 1.0}
+                self._date = date
+                self._fetched_at = time.monotonic()
+                self._failed_at = None
+                self._last_error = None
+                logger.info(f"Fetched {len(self._rates)} exchange rates for {date}.")
+                return self._date, self._rates
+        finally:
+            self._refresh_lock.release()
+
+    @staticmethod
+    def _rate_from(rates: dict[str, float], from_currency: str, to_currency: str) -> float:
+        from_currency, to_currency = from_currency.upper(), to_currency.upper()
+        for currency in (from_currency, to_currency):
+            if currency not in rates:
+                raise FxRateError(f"Unsupported currency: '{currency}'. Supported: {', '.join(sorted(rates))}")
+        return rates[to_currency] / rates[from_currency]
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """
+        Returns the exchange rate from `from_currency` to `to_currency`.
+        """
+        _, rates = self.get_rates()
+        return self._rate_from(rates, from_currency, to_currency)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        """
+        Converts `amount` between currencies, rounded to 2 decimals.
+        """
+        return round(amount * self.rate(from_currency, to_currency), 2)
+
+    def convert_batch(self, conversions: list[tuple[float, str, str]]) -> list[dict]:
+        """
+        Converts many `(amount, from_currency, to_currency)` triples from a single rate snapshot.
+        Unknown currencies are reported per item instead of failing the whole batch.
+        """
+        date, rates = self.get_rates()
+        results = []
+        for amount, from_currency, to_currency in conversions:
+            result = {"amount": amount, "from_currency": from_currency, "to_currency": to_currency, "date": date}
+            try:
+                rate = self._rate_from(rates, from_currency, to_currency)
+                result["rate"] = rate
+                result["converted_amount"] = round(amount * rate, 2)
+            except FxRateError as e:
+                result["error"] = str(e)
+            results.append(result)
+        return results
+
+
+# Shared client used by the model tools; replace it (or its fetch) to stub the upstream
+FX_CLIENT = FxRateClient()
@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import time
+import logging
+from typing import Callable
+from google import genai
+from google.genai import types
+from src.config import (
+    GEMINI_API_KEY,
+    DEFAULT_EMBEDDING_MODEL,
+    REPORTS_JSON_DIR,
+    EMBEDDINGS_REPORTS_DIR,
+    EMBEDDINGS_QUESTIONS_DIR,
+    QUESTIONS_JSON_PATH,
+    DEDUP_THRESHOLD,
+    EMBEDDING_REQUEST_DELAY_SECONDS,
+    EMBEDDING_CALL_DEADLINE_SECONDS,
+    EMBEDDING_ATTEMPT_TIMEOUT_SECONDS
+)
+from src.chunking import chunk_report
+from src.dedup import NearDuplicateDetector
+from src.resilience import resilient_call
+
+DEDUP_LINKS_FILENAME = ".dedup_links"  # Dedup report and duplicate paragraph -> canonical chunk links
+
+# Configure logging for this module
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Initialize GenAI client once
+if GEMINI_API_KEY:
+    try:
+        genai_client = genai.Client(api_key=GEMINI_API_KEY)
+    except Exception as e:
+        logger.error(f"Failed to initialize Google GenAI client: {e}")
+        genai_client = None
+else:
+    logger.warning("GEMINI_API_KEY not set. Embedding generation will fail.")
+    genai_client = None
+
+
+def get_embedding(text: str, model: str = DEFAULT_EMBEDDING_MODEL, hedge: bool = False) -> list[float]:
+    """
+    Generates an embedding for a given text string using Google's Generative AI.
+    Transient failures are retried (see src/resilience.py). With `hedge=True`, slow calls
+    are duplicated to cut tail latency; only use it for interactive calls, as batch ingest
+    is bound by the API quota rather than by latency.
+    """
+    if not genai_client:
+        raise ValueError("Google GenAI client not initialized. GEMINI_API_KEY might be missing or invalid.")
+
+    try:
+        response = resilient_call(
+            "embed_content",
+            lambda: genai_client.models.embed_content(
+                model=model,
+                contents=text,
+                config=types.EmbedContentConfig(
+                    http_options=types.HttpOptions(timeout=int(EMBEDDING_ATTEMPT_TIMEOUT_SECONDS * 1000))
+                )
+            ),
+            deadline=EMBEDDING_CALL_DEADLINE_SECONDS,
+            attempt_timeout=EMBEDDING_ATTEMPT_TIMEOUT_SECONDS,
+            hedge=hedge
+        )
+        return response.embeddings[0].values
+    except Exception as e:
+        logger.error(f"Error getting embedding for text: '{text}'. Model: '{model}'. Error: {e}", exc_info=True)
+        raise # Re-raise the exception for proper error handling upstream
+
+
+def remove_report_embeddings(report_name: str, save_dir: str = EMBEDDINGS_REPORTS_DIR, keep: set = frozenset()) -> int:
+    """
+    Deletes the saved embeddings of a report ("<report>-<paragraph>-<chunk>.json", and
+    "<report>-<paragraph>.json" from before chunking), except those whose id is in `keep`.
+    Returns the number of files removed.
+    """
+    if not os.path.exists(save_dir):
+        return 0
+    pattern = re.compile(rf"{re.escape(report_name)}-\d+(-\d+)?\.json")
+    removed = 0
+    for fname in os.listdir(save_dir):
+        if pattern.fullmatch(fname) and fname[:-5] not in keep:
+            os.remove(os.path.join(save_dir, fname))
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} saved embeddings of {report_name}")
+    return removed
+
+
+def _is_current(path: str, metadata: dict) -> bool:
+    """
+    True if an embedding was saved at `path` for a chunk with exactly this metadata
+    (same text and paragraph span); chunk ids alone don't change when content does.
+    """
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            return json.load(f).get("metadata") == metadata
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return False
+
+
+def _ingest_order(source_dir: str, save_dir: str) -> list[str]:
+    """
+    Returns the report filenames of `source_dir`: those ingested by earlier runs first, in
+    their recorded order, then new ones sorted by name. The first ingested copy of a
+    paragraph thus stays canonical on every run.
+    """
+    try:
+        with open(os.path.join(save_dir, DEDUP_LINKS_FILENAME), "r", encoding='utf-8') as f:
+            previous = json.load(f).get("reports", [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = []
+    available = sorted(fname for fname in os.listdir(source_dir) if fname.endswith(".json"))
+    known = [f"{name}.json" for name in previous if f"{name}.json" in available]
+    return known + sorted(set(available) - set(known))
+
+
+def generate_report_embeddings(
+    source_dir: str = REPORTS_JSON_DIR,
+    save_dir: str = EMBEDDINGS_REPORTS_DIR,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+    embed_fn: Callable[[str], list[float]] = get_embedding,
+    request_delay: float = EMBEDDING_REQUEST_DELAY_SECONDS
+):
+    """
+    Generates embeddings for token-bounded chunks of the paragraphs extracted from JSON reports and saves them.
+    Paragraphs that near-duplicate an earlier paragraph (MinHash similarity >= `dedup_threshold`)
+    are not embedded, and their previously saved chunks are deleted; the `.dedup_links` report
+    of `save_dir` links each of them to its canonical paragraph and to the ids of the chunk
+    vectors holding that paragraph. Reports are processed in the order they were first
+    ingested (recorded in `.dedup_links`), so adding a report never changes which copy of a
+    paragraph is canonical. Pass `dedup_threshold=None` to embed every paragraph, and a stub
+    `embed_fn` with `request_delay=0` to run offline.
+    """
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+        logger.info(f"Created save directory: {save_dir}")
+
+    vectors = []
+    detector = NearDuplicateDetector(threshold=dedup_threshold) if dedup_threshold is not None else None
+    links = {}  # Duplicate paragraph id -> canonical paragraph id
+    paragraph_chunks = {}  # Paragraph id -> ids of the chunks containing it, across reports
+    ingested = []  # Report names in ingest order, saved for the next run
+    logger.info(f"Starting to generate embeddings for reports from: {source_dir}")
+
+    for fname in _ingest_order(source_dir, save_dir):
+        file_path = os.path.join(source_dir, fname)
+        report_name = fname[:-5] # remove .json
+
+        with open(file_path, "r", encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Error decoding JSON from {fname}: {e}. Skipping file.")
+                continue
+
+        ingested.append(report_name)
+        report_date = data.get("report_date")
+        content_list = data.get("content", [])
+
+        if detector:
+            deduplicated = []
+            for i, paragraph in enumerate(content_list):
+                paragraph_text = paragraph.get("paragraph", "")
+                canonical = detector.check(f"{report_name}-{i}", paragraph_text) if paragraph_text.strip() else None
+                if canonical:
+                    links[f"{report_name}-{i}"] = canonical
+                    # Blank out rather than remove so chunk ids keep their paragraph indices
+                    paragraph = {**paragraph, "paragraph": ""}
+                deduplicated.append(paragraph)
+            content_list = deduplicated
+
+        chunks = chunk_report(report_name, report_date, content_list)
+        # Saved embeddings this report no longer produces (per-paragraph files from before
+        # chunking, chunks of edited or re-chunked paragraphs) would still be upserted
+        remove_report_embeddings(report_name, save_dir, keep={chunk["id"] for chunk in chunks})
+        for chunk in chunks:
+            # Merged chunks span several paragraphs and are named after the first one
+            metadata = chunk["metadata"]
+            for i in range(metadata["paragraph_index"], metadata["last_paragraph_index"] + 1):
+                paragraph_chunks.setdefault(f"{report_name}-{i}", []).append(chunk["id"])
+
+        for chunk in chunks:
+            _id = chunk["id"]
+            output_fname = f"{_id}.json"
+            outpath = os.path.join(save_dir, output_fname)
+
+            if _is_current(outpath, chunk["metadata"]):
+                logger.debug(f"Embedding for {_id} already exists. Skipping.")
+                continue
+
+            try:
+                embedding = embed_fn(chunk["text"])
+            except Exception as e:
+                logger.error(f"Failed to get embedding for chunk {_id}: {e}. Skipping.", exc_info=True)
+                continue
+
+            vector = {
+                "id": _id,
+                "values": embedding,
+                "metadata": chunk["metadata"] # Chunk text is stored for context, be mindful of size
+            }
+            vectors.append(vector)
+
+            # Save as JSON immediately after generating
+            try:
+                with open(outpath, "w", encoding='utf-8') as f_out:
+                    json.dump(vector, f_out, indent=2)
+                logger.info(f"Generated and saved embedding for: {_id}")
+            except IOError as e:
+                logger.error(f"Failed to save embedding for {_id} to {outpath}: {e}", exc_info=True)
+
+            # Apply a small delay to respect API rate limits (adjust as needed)
+            time.sleep(request_delay) # Consider adaptive rate limiting or batch processing
+
+    if detector:
+        summary = detector.summary()
+        logger.info(f"Skipped {summary['duplicates']} near-duplicate paragraphs out of {summary['paragraphs']} "
+                    f"({summary['duplicate_ratio']:.1%}) at threshold {summary['threshold']}.")
+        try:
+            with open(os.path.join(save_dir, DEDUP_LINKS_FILENAME), "w", encoding='utf-8') as f_out:
+                json.dump({**summary, "reports": ingested, "links": {
+                    duplicate: {"canonical_paragraph": canonical, "chunk_ids": paragraph_chunks.get(canonical, [])}
+                    for duplicate, canonical in links.items()
+                }}, f_out, indent=2)
+        except IOError as e:
+            logger.error(f"Failed to save deduplication report: {e}", exc_info=True)
+
+    logger.info(f"Finished generating embeddings for reports. Total generated: {len(vectors)}")
+    return vectors
+
+
+def generate_question_embeddings(questions_path: str = QUESTIONS_JSON_PATH, save_dir: str = EMBEDDINGS_QUESTIONS_DIR):
+    """
+    Generates embeddings for predefined questions and saves them.
+    """
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+        logger.info(f"Created save directory: {save_dir}")
+
+    try:
+        with open(questions_path, "r", encoding='utf-8') as f:
+            questions = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"Questions file not found: {questions_path}")
+        return
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding questions JSON from {questions_path}: {e}")
+        return
+
+    logger.info(f"Starting to generate embeddings for {len(questions)} questions from: {questions_path}")
+
+    for i, question in enumerate(questions):
+        output_fname = f"q{i}.json"
+        outpath = os.path.join(save_dir, output_fname)
+
+        if os.path.exists(outpath):
+            logger.debug(f"Embedding for question {i} already exists. Skipping.")
+            continue
+
+        try:
+            embedding = get_embedding(question)
+        except Exception as e:
+            logger.error(f"Failed to get embedding for question '{question}' (index {i}): {e}. Skipping.", exc_info=True)
+            continue
+
+        query_data = {
+            "values": embedding,
+            "text": question
+        }
+
+        try:
+            with open(outpath, 'w', encoding='utf-8') as out_f:
+                json.dump(query_data, out_f, indent=2)
+            logger.info(f"Generated and saved embedding for question {i}")
+        except IOError as e:
+            logger.error(f"Failed to save embedding for question {i} to {outpath}: {e}", exc_info=True)
+
+        time.sleep(EMBEDDING_REQUEST_DELAY_SECONDS) # Apply delay
+
+    logger.info(f"Finished generating embeddings for questions.")
+
+
+if __name__ == "__main__":
+    # Example usage for CLI:
+    # python src/gen_embed.py reports
+    # python src/gen_embed.py questions
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate embeddings for reports or questions.")
+    parser.add_argument("type", choices=["reports", "questions", "test"],
+                        help="Specify 'reports' to generate report embeddings, 'questions' for question embeddings, or 'test' for a quick test.")
+    args = parser.parse_args()
+
+    if args.type == "reports":
+        generate_report_embeddings()
+    elif args.type == "questions":
+        generate_question_embeddings()
+    elif args.type == "test":
+        # Quick test function (similar to your original gen_embedding_test)
+        try:
+            input_string = "How does alphafold work?"
+            embedding_vector = get_embedding(input_string)
+            logger.info(f"Embedding for '{input_string}':")
+            logger.info(f"First 10 dimensions: {embedding_vector[:10]}")
+            logger.info(f"Embedding dimension: {len(embedding_vector)}")
+        except ValueError as ve:
+            logger.error(f"Configuration Error: {ve}")
+        except Exception as ex:
+            logger.error(f"An unexpected error occurred during execution: {ex}")
\ No newline at end of file
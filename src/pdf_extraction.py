@@ -1,3 +1,35 @@
+# src/pdf_extraction.py
+
+import io
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from google import genai
+from google.genai import types
+from pypdf import PdfReader, PdfWriter
+from src.config import (
+    GEMINI_API_KEY,
+    DEFAULT_LLM_MODEL,
+    REPORTS_PDF_DIR,
+    REPORTS_JSON_DIR,
+    EMBEDDINGS_REPORTS_DIR,
+    PDF_EXTRACTION_WORKERS,
+    PDF_PAGES_PER_CHUNK,
+    PDF_EXTRACTION_TIMEOUT_SECONDS,
+    EMBEDDING_REQUEST_DELAY_SECONDS
+)
+from src.gen_embed import generate_report_embeddings, get_embedding, remove_report_embeddings
+from src.report_index import write_report_index
+
+# Configure logging for this module
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = ".extraction_cache"  # PDF filename -> sha256 of the last extracted version
+
 prompt = """
 Task:
 Extract paragraph titles and their corresponding text from the provided PDF document.
@@ -34,4 +66,245 @@ Constraints:
 - The output must be valid JSON.
 - Use only ASCII characters in both keys and values.
 - Do not include any explanatory text, comments, or metadata outside the JSON object.
-"""
\ No newline at end of file
+"""
+
+# Initialize GenAI client once
+if GEMINI_API_KEY:
+    try:
+        genai_client = genai.Client(api_key=GEMINI_API_KEY)
+    except Exception as e:
+        logger.error(f"Failed to initialize Google GenAI client: {e}")
+        genai_client = None
+else:
+    logger.warning("GEMINI_API_KEY not set. PDF extraction will fail.")
+    genai_client = None
+
+
+def extract_with_gemini(pdf_bytes: bytes, model: str = DEFAULT_LLM_MODEL) -> str:
+    """
+    Sends a PDF (or a page range of one) to the Gemini model and returns the raw JSON text.
+    """
+    if not genai_client:
+        raise ValueError("Google GenAI client not initialized. GEMINI_API_KEY might be missing or invalid.")
+
+    response = genai_client.models.generate_content(
+        model=model,
+        contents=[
+            types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf"),
+            prompt
+        ],
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            http_options=types.HttpOptions(timeout=int(PDF_EXTRACTION_TIMEOUT_SECONDS * 1000))
+        )
+    )
+    return response.text
+
+
+def validate_report(data, require_date: bool = True) -> dict:
+    """
+    Checks that extracted data matches the report schema consumed downstream:
+    {"report_date": str, "content": [{"title": str, "paragraph": str}, ...]}
+    With `require_date=False` (single page ranges, which may not show the date),
+    'report_date' may be missing or null.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Extracted report must be a JSON object.")
+    report_date = data.get("report_date")
+    if require_date and not (isinstance(report_date, str) and report_date.strip()):
+        raise ValueError("Extracted report is missing a non-empty string 'report_date'.")
+    if not require_date and report_date is not None and not isinstance(report_date, str):
+        raise ValueError("Extracted 'report_date' must be a string or null.")
+    content = data.get("content")
+    if not isinstance(content, list):
+        raise ValueError("Extracted report is missing a 'content' list.")
+    for i, paragraph in enumerate(content):
+        if not isinstance(paragraph, dict):
+            raise ValueError(f"Content item {i} is not an object.")
+        for key in ("title", "paragraph"):
+            if not isinstance(paragraph.get(key), str):
+                raise ValueError(f"Content item {i} is missing a string '{key}'.")
+    return data
+
+
+def _parse_extraction(raw_text: str) -> dict:
+    """
+    Parses the model output, tolerating a Markdown code fence around the JSON.
+    """
+    text = raw_text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
+
+
+def split_pdf(pdf_bytes: bytes, pages_per_chunk: int = PDF_PAGES_PER_CHUNK) -> list[bytes]:
+    """
+    Splits a PDF into page ranges of at most `pages_per_chunk` pages.
+    Returns the PDF unchanged if it is small enough.
+    """
+    if pages_per_chunk <= 0:
+        return [pdf_bytes]
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    num_pages = len(reader.pages)
+    if num_pages <= pages_per_chunk:
+        return [pdf_bytes]
+
+    chunks = []
+    for start in range(0, num_pages, pages_per_chunk):
+        writer = PdfWriter()
+        for page in reader.pages[start:start + pages_per_chunk]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append(buffer.getvalue())
+    return chunks
+
+
+def merge_extractions(parts: list[dict]) -> dict:
+    """
+    Merges page-range extractions (in page order) into a single report.
+    The report date is taken from the first range that provides one.
+    """
+    report_date = next((part["report_date"] for part in parts if part.get("report_date")), "")
+    content = [paragraph for part in parts for paragraph in part["content"]]
+    return {"report_date": report_date, "content": content}
+
+
+def _load_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring corrupt extraction cache: {cache_path}")
+        return {}
+
+
+def extract_reports(
+    pdf_dir: str = REPORTS_PDF_DIR,
+    save_dir: str = REPORTS_JSON_DIR,
+    extract_fn: Callable[[bytes], str] = extract_with_gemini,
+    max_workers: int = PDF_EXTRACTION_WORKERS,
+    pages_per_chunk: int = PDF_PAGES_PER_CHUNK
+) -> list[str]:
+    """
+    Extracts every PDF in `pdf_dir` into report JSON files in `save_dir`.
+    Page ranges of all PDFs are extracted concurrently on a shared worker pool.
+    PDFs whose content hash is unchanged since the last run are skipped.
+    Pass a stub `extract_fn` (PDF bytes -> JSON text) to run offline.
+    Returns the paths of the JSON files written in this run.
+    """
+    if not os.path.exists(pdf_dir):
+        logger.error(f"PDF directory not found: {pdf_dir}")
+        return []
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+        logger.info(f"Created save directory: {save_dir}")
+
+    cache_path = os.path.join(save_dir, CACHE_FILENAME)
+    cache = _load_cache(cache_path)
+
+    pending = {}  # output path -> (pdf hash, page-range chunks)
+    for fname in sorted(os.listdir(pdf_dir)):
+        if not fname.lower().endswith(".pdf"):
+            continue
+
+        with open(os.path.join(pdf_dir, fname), 'rb') as f:
+            pdf_bytes = f.read()
+        pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+        outpath = os.path.join(save_dir, f"{os.path.splitext(fname)[0]}.json")
+
+        if cache.get(fname) == pdf_hash and os.path.exists(outpath):
+            logger.debug(f"{fname} is unchanged since last extraction. Skipping.")
+            continue
+
+        try:
+            chunks = split_pdf(pdf_bytes, pages_per_chunk)
+        except Exception as e:
+            logger.error(f"Failed to split {fname}: {e}. Skipping.", exc_info=True)
+            continue
+        pending[fname] = (pdf_hash, outpath, chunks)
+        logger.info(f"Queued {fname} for extraction ({len(chunks)} page range(s)).")
+
+    if not pending:
+        logger.info("No new or changed PDFs to extract.")
+        return []
+
+    def _extract_chunk(chunk: bytes) -> dict:
+        return validate_report(_parse_extraction(extract_fn(chunk)), require_date=False)
+
+    written = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            fname: [executor.submit(_extract_chunk, chunk) for chunk in chunks]
+            for fname, (_, _, chunks) in pending.items()
+        }
+        for fname, chunk_futures in futures.items():
+            pdf_hash, outpath, _ = pending[fname]
+            try:
+                report = validate_report(merge_extractions([future.result() for future in chunk_futures]))
+            except Exception as e:
+                logger.error(f"Failed to extract {fname}: {e}. Skipping.", exc_info=True)
+                continue
+
+            try:
+                with open(outpath, 'w', encoding='utf-8') as f_out:
+                    json.dump(report, f_out, indent=2)
+            except IOError as e:
+                logger.error(f"Failed to save extraction for {fname} to {outpath}: {e}", exc_info=True)
+                continue
+
+            write_report_index(outpath)
+            cache[fname] = pdf_hash
+            written.append(outpath)
+            logger.info(f"Extracted {fname} -> {outpath} ({len(report['content'])} paragraphs)")
+
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+
+    logger.info(f"Finished extracting PDFs. Total extracted: {len(written)}")
+    return written
+
+
+def run_pipeline(
+    pdf_dir: str = REPORTS_PDF_DIR,
+    json_dir: str = REPORTS_JSON_DIR,
+    embeddings_dir: str = EMBEDDINGS_REPORTS_DIR,
+    extract_fn: Callable[[bytes], str] = extract_with_gemini,
+    max_workers: int = PDF_EXTRACTION_WORKERS,
+    embed_fn: Callable[[str], list[float]] = get_embedding,
+    request_delay: float = EMBEDDING_REQUEST_DELAY_SECONDS
+) -> list:
+    """
+    Extracts new or changed PDFs and generates embeddings for the resulting reports.
+    The embeddings of re-extracted reports are deleted first so that they are regenerated
+    from the new content. Pass stub `extract_fn` and `embed_fn` (with `request_delay=0`)
+    to run offline.
+    """
+    for report_path in extract_reports(pdf_dir, json_dir, extract_fn=extract_fn, max_workers=max_workers):
+        report_name = os.path.splitext(os.path.basename(report_path))[0]
+        remove_report_embeddings(report_name, embeddings_dir)
+    return generate_report_embeddings(source_dir=json_dir, save_dir=embeddings_dir,
+                                      embed_fn=embed_fn, request_delay=request_delay)
+
+
+if __name__ == "__main__":
+    # Example usage for CLI:
+    # python -m src.pdf_extraction extract
+    # python -m src.pdf_extraction pipeline
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract broker PDFs into report JSON files.")
+    parser.add_argument("action", choices=["extract", "pipeline"],
+                        help="Specify 'extract' to convert PDFs to JSON, or 'pipeline' to also generate embeddings.")
+    parser.add_argument("--pdf_dir", type=str, default=REPORTS_PDF_DIR, help="Directory containing the PDFs.")
+    parser.add_argument("--workers", type=int, default=PDF_EXTRACTION_WORKERS, help="Number of concurrent extraction calls.")
+    args = parser.parse_args()
+
+    if args.action == "extract":
+        extract_reports(args.pdf_dir, max_workers=args.workers)
+    elif args.action == "pipeline":
+        run_pipeline(args.pdf_dir, max_workers=args.workers)
@@ -1,8 +1,16 @@
 # src/query_engine.py
 
 import os
+import json
+import time
+import heapq
+import hashlib
 import datetime
 import logging
+import itertools
+import threading
+from typing import Optional
+from concurrent.futures import Future
 from google import genai
 from google.genai import types
 from pathlib import Path
@@ -12,8 +20,18 @@ from pathlib import Path
 from src.config import (
     GEMINI_API_KEY,
     DEFAULT_LLM_MODEL,
-    REPORTS_JSON_DIR
+    REPORTS_JSON_DIR,
+    LLM_MAX_CONCURRENCY,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_MAX_QUEUE_SIZE,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_CALL_DEADLINE_SECONDS,
+    LLM_ATTEMPT_TIMEOUT_SECONDS
 )
+from src.chunking import estimate_tokens
+from src import fx_rates
+from src.report_index import read_report_sections
+from src.resilience import resilient_call
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
@@ -34,6 +52,139 @@ if not GEMINI_API_KEY:
 LLM_CLIENT = genai.Client(api_key=GEMINI_API_KEY)
 
 
+# --- Request Scheduling ---
+
+class SchedulerOverloaded(Exception):
+    """Raised when the request queue is full. `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM request queue is full. Retry after {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class RequestScheduler:
+    """
+    Admission control for upstream model calls shared by all request threads.
+
+    Calls run at most `max_concurrency` at a time and within a token-rate budget
+    (`tokens_per_minute`, refilled continuously). Waiting calls are served from a
+    priority queue (lower value first, FIFO within a priority); once `max_queue_size`
+    calls are waiting, new ones are rejected with `SchedulerOverloaded`.
+    Concurrent calls with the same key share a single upstream call (single-flight).
+    A call keeps its concurrency slot until it releases it, so upstream requests it
+    abandoned on timeout still count against `max_concurrency` while they run.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        max_queue_size: int = LLM_MAX_QUEUE_SIZE
+    ):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue_size = max_queue_size
+        self._condition = threading.Condition()
+        self._queue = []  # Heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._active = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._inflight = {}  # key -> Future of the call being made for it
+        self._avg_duration = 5.0  # Moving average of call duration in seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.tokens_per_minute),
+            self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60.0
+        )
+        self._refilled_at = now
+
+    def _retry_after(self) -> float:
+        waves = (len(self._queue) + self._active) / max(self.max_concurrency, 1)
+        return max(1.0, waves * self._avg_duration)
+
+    def submit(self, key: str, fn, estimated_tokens: int, priority: int = 0):
+        """
+        Runs `fn(release)` once admitted and returns its result. If a call with the same
+        `key` is already queued or running, waits for it and returns its result instead.
+
+        The concurrency slot is freed when `fn` calls `release()` (e.g. as the `on_settled`
+        hook of `resilient_call`), which it must do once all the work it started has finished.
+        """
+        with self._condition:
+            shared = self._inflight.get(key)
+            if shared is None:
+                if len(self._queue) >= self.max_queue_size:
+                    raise SchedulerOverloaded(self._retry_after())
+                future = Future()
+                self._inflight[key] = future
+        if shared is not None:
+            logger.info("Joining identical in-flight LLM request.")
+            return shared.result()
+
+        try:
+            self._acquire(min(estimated_tokens, self.tokens_per_minute), priority)
+        except BaseException as e:
+            with self._condition:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            with self._condition:
+                if released:
+                    return
+                released = True
+                self._active -= 1
+                self._condition.notify_all()
+
+        try:
+            result = fn(release)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._condition:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+                del self._inflight[key]
+                self._condition.notify_all()
+
+    def _acquire(self, tokens: int, priority: int):
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._queue[0] == ticket and self._active < self.max_concurrency:
+                        if self._tokens >= tokens:
+                            break
+                        # Sleep until enough tokens have been refilled
+                        self._condition.wait((tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+                    else:
+                        self._condition.wait()
+                heapq.heappop(self._queue)
+                self._active += 1
+                self._tokens -= tokens
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                raise
+            finally:
+                self._condition.notify_all()
+
+
+REQUEST_SCHEDULER = RequestScheduler()
+
+
 
 # --- Helper Functions (Tools) ---
 
@@ -51,22 +202,38 @@ def _get_current_date() -> str:
 
 
 
-import requests
+def _convert_currency(amount: float, from_currency: str, to_currency: str) -> dict:
+    """Converts an amount of money from one currency to another using the latest
+    ECB reference exchange rates (e.g. from_currency='USD', to_currency='EUR').
+    Returns the converted amount, the rate used and the date of the rates, or an
+    error listing the supported currencies.
+    This is a helper function for the LLM tool.
+    """
+    try:
+        return fx_rates.FX_CLIENT.convert_batch([(amount, from_currency, to_currency)])[0]
+    except fx_rates.FxRateError as e:
+        logger.error(f"Currency conversion failed: {e}")
+        return {"error": str(e)}
 
-def _convert(from_currency, to_currency, amount):
-    url = "https://api.frankfurter.dev/v1/latest"
-    params = {
-        "base": from_currency,
-        "symbols": to_currency
-    }
 
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        rate = data["rates"][to_currency]
-        converted_amount = round(amount * rate, 2)
-        return converted_amount
+def _convert_currency_batch(amounts: list[float], from_currencies: list[str], to_currencies: list[str]) -> list[dict]:
+    """Converts several amounts in one call. Item i converts amounts[i] from
+    from_currencies[i] to to_currencies[i]; a list with a single element is applied
+    to every item (e.g. one amount into many currencies, or many amounts between one pair).
+    This is a helper function for the LLM tool.
+    """
+    size = max(len(amounts), len(from_currencies), len(to_currencies))
+    columns = []
+    for column in (amounts, from_currencies, to_currencies):
+        if len(column) not in (1, size):
+            return [{"error": "amounts, from_currencies and to_currencies must have the same length or a single element."}]
+        columns.append(column * size if len(column) == 1 else column)
 
+    try:
+        return fx_rates.FX_CLIENT.convert_batch(list(zip(*columns)))
+    except fx_rates.FxRateError as e:
+        logger.error(f"Batch currency conversion failed: {e}")
+        return [{"error": str(e)}]
 
 
 def _list_reports() -> list[str]:
@@ -75,7 +242,7 @@ def _list_reports() -> list[str]:
     This is a helper function for the LLM tool.
     """
     try:
-        return os.listdir(REPORTS_JSON_DIR)
+        return sorted(f for f in os.listdir(REPORTS_JSON_DIR) if f.endswith(".json"))
     except FileNotFoundError:
         logger.error(f"Reports directory not found: {REPORTS_JSON_DIR}")
         return []
@@ -84,26 +251,33 @@ def _list_reports() -> list[str]:
         return []
 
 
-def _read_file_content(filename: str) -> str:
-    """Reads the content of a specified file and returns it as a string.
+def _read_report_sections(report: str, indices: Optional[list[int]] = None, title_match: str = "", offset: int = 0) -> dict:
+    """Reads sections of a report. Without indices or title_match, returns the report
+    date and its table of contents (index and title of every section). Otherwise returns
+    the sections at the given indices and/or whose title contains title_match
+    (case-insensitive). Output is capped per call; 'truncated' is true when some
+    requested sections were left out and should be requested separately. A section too
+    long for one call is cut and returned with a 'next_offset'; call again with that
+    section's index and offset=next_offset to read the rest of it.
     Only allows reading files from a pre-defined directory (REPORTS_JSON_DIR).
     This is a helper function for the LLM tool.
     """
-    filepath = os.path.join(REPORTS_JSON_DIR, os.path.basename(filename))
+    filepath = os.path.join(REPORTS_JSON_DIR, os.path.basename(report))
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
+        return read_report_sections(filepath, indices=indices, title_match=title_match, offset=offset)
     except FileNotFoundError:
-        return f"Error: File '{filename}' not found in the allowed directory."
-    except IOError as e:
-        return f"Error reading file '{filename}': {e}"
+        return {"error": f"Report '{report}' not found in the allowed directory."}
+    except (ValueError, IOError) as e:
+        logger.error(f"Error reading sections of report '{report}': {e}", exc_info=True)
+        return {"error": f"Error reading report '{report}': {e}"}
 
 
-def generate_ai_response(conversation_history: list[dict], model: str = DEFAULT_LLM_MODEL) -> str:
+def generate_ai_response(conversation_history: list[dict], model: str = DEFAULT_LLM_MODEL, priority: int = 0) -> str:
     """
     Generates an AI response based on the entire conversation history using the Gemini model.
-    Utilizes predefined tools for current date and file reading.
+    Utilizes predefined tools for current date, report section reading and currency conversion.
+    The call goes through REQUEST_SCHEDULER; raises SchedulerOverloaded when the queue is full.
+    Transient failures are retried; raises DeadlineExceeded if no answer arrives in time.
     """
     system_instructions = """
 # Context
@@ -149,7 +323,8 @@ You have access to the following specialized tools to assist with your analysis:
 * **Usage Flow:**
     1.  **Call `_list_reports()`**: This will return a list of all available report filenames.
     2.  **Identify Relevant Reports**: Examine the returned filenames to determine which reports are most likely to contain the information needed for the user's query.
-    3.  **Read Report Content**: Use the `_read_file_content(file)` method to access the full content of a specific report. Replace `file` with the exact filename obtained from `_list_reports()`.
+    3.  **Browse Report Sections**: Call `_read_report_sections(report)` with the exact filename obtained from `_list_reports()`. This returns the report date and its table of contents (section indices and titles).
+    4.  **Read Relevant Sections**: Call `_read_report_sections(report, indices=[...])` with the indices of the sections you need, or `_read_report_sections(report, title_match="...")` to read the sections whose title contains a keyword. Only request the sections needed to answer; if the result is `truncated`, request the remaining sections in a further call. A section returned with a `next_offset` was cut: call `_read_report_sections(report, indices=[<its index>], offset=<next_offset>)` to read the rest of it.
 
 * **Expected Report Filename Patterns:**
     * **Company Reports:** `"company_report_<company_name>_<report_date>.json"`
@@ -158,6 +333,12 @@ You have access to the following specialized tools to assist with your analysis:
         * *Example:* `"economics_non_corporate_report_2025-06-05.json"`
     * **Strategic Reports:** `"strategy_noncorporate_report_<report_date>.json"`
         * *Example:* `"strategy_noncorporate_report_2025-06-01.json"`
+
+### 3. Convert Currency
+
+* **Tools:** `_convert_currency(amount, from_currency, to_currency)` and `_convert_currency_batch(amounts, from_currencies, to_currencies)`
+* **Purpose:** To convert amounts between currencies (ISO codes such as `"USD"`, `"EUR"`, `"JPY"`) using the latest ECB reference exchange rates. Only about 30 major currencies are covered (the Vietnamese dong, VND, is not); if a conversion returns an error, tell the user the currency is not supported rather than guessing a rate.
+* **When to Use:** Whenever the user asks for a figure in a different currency than the one reported. Use the batch tool when several amounts or currency pairs are needed, rather than calling `_convert_currency` repeatedly.
 """
 
     try:
@@ -165,14 +346,35 @@ You have access to the following specialized tools to assist with your analysis:
         if conversation_history:
             logger.debug(f"Last message in history: {conversation_history[-1]}")
 
-        response = LLM_CLIENT.models.generate_content(
-            model=model,
-            contents=conversation_history,
-            config=types.GenerateContentConfig(
-                tools=[_get_current_date, _list_reports, _read_file_content],
-                system_instruction=system_instructions,
-                max_output_tokens=2048
-            )
+        request_key = hashlib.sha256(
+            json.dumps([model, conversation_history], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        estimated_tokens = (
+            estimate_tokens(system_instructions)
+            + estimate_tokens(json.dumps(conversation_history, default=str))
+            + LLM_MAX_OUTPUT_TOKENS
+        )
+        response = REQUEST_SCHEDULER.submit(
+            request_key,
+            lambda release: resilient_call(
+                "generate_content",
+                lambda: LLM_CLIENT.models.generate_content(
+                    model=model,
+                    contents=conversation_history,
+                    config=types.GenerateContentConfig(
+                        tools=[_get_current_date, _list_reports, _read_report_sections,
+                               _convert_currency, _convert_currency_batch],
+                        system_instruction=system_instructions,
+                        max_output_tokens=LLM_MAX_OUTPUT_TOKENS,
+                        http_options=types.HttpOptions(timeout=int(LLM_ATTEMPT_TIMEOUT_SECONDS * 1000))
+                    )
+                ),
+                deadline=LLM_CALL_DEADLINE_SECONDS,
+                attempt_timeout=LLM_ATTEMPT_TIMEOUT_SECONDS,
+                on_settled=release
+            ),
+            estimated_tokens,
+            priority=priority
         )
 
         # Log the raw response object to see its structure
@@ -199,6 +401,9 @@ You have access to the following specialized tools to assist with your analysis:
                 logger.warning("Gemini model returned an empty response with no text or identifiable content.")
             return "I couldn't generate a text response for that. Can you please rephrase or provide more details?"
 
+    except SchedulerOverloaded as so:
+        logger.warning(f"Rejecting AI response request: {so}")
+        raise
     except Exception as e:
         logger.error(f"Error generating AI response: {e}", exc_info=True)
         raise # Re-raise for calling context to handle
@@ -0,0 +1,240 @@
+# src/report_index.py
+
+import os
+import re
+import json
+import logging
+from src.config import REPORT_READ_MAX_BYTES
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = "_index"  # Created inside the reports directory
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\n\r":
+        pos += 1
+    return pos
+
+
+def _expect(text: str, pos: int, char: str) -> int:
+    pos = _skip_whitespace(text, pos)
+    if pos >= len(text) or text[pos] != char:
+        raise ValueError(f"Expected '{char}' at position {pos}.")
+    return pos + 1
+
+
+def _scan_report(text: str) -> tuple[str, list[tuple[int, int, dict]]]:
+    """
+    Walks the top-level report object and returns its date plus the
+    (start, end, value) character span of every item of its "content" array.
+    """
+    decoder = json.JSONDecoder()
+    report_date = None
+    spans = []
+
+    pos = _expect(text, 0, "{")
+    pos = _skip_whitespace(text, pos)
+    if text[pos] == "}":
+        return report_date, spans
+
+    while True:
+        key, pos = decoder.raw_decode(text, _skip_whitespace(text, pos))
+        pos = _skip_whitespace(text, _expect(text, pos, ":"))
+
+        if key == "content":
+            pos = _skip_whitespace(text, _expect(text, pos, "["))
+            if text[pos] == "]":
+                pos += 1
+            else:
+                while True:
+                    start = _skip_whitespace(text, pos)
+                    value, pos = decoder.raw_decode(text, start)
+                    spans.append((start, pos, value))
+                    pos = _skip_whitespace(text, pos)
+                    if text[pos] == "]":
+                        pos += 1
+                        break
+                    pos = _expect(text, pos, ",")
+        else:
+            value, pos = decoder.raw_decode(text, pos)
+            if key == "report_date":
+                report_date = value
+
+        pos = _skip_whitespace(text, pos)
+        if text[pos] == "}":
+            return report_date, spans
+        pos = _expect(text, pos, ",")
+
+
+def build_report_index(report_path: str) -> dict:
+    """
+    Builds the section index of a report JSON file: its date plus the byte offset,
+    byte length and title of every paragraph, so single sections can be read
+    without loading the whole file.
+    """
+    with open(report_path, 'rb') as f:
+        raw = f.read()
+    text = raw.decode('utf-8')
+    report_date, spans = _scan_report(text)
+
+    sections = []
+    char_pos, byte_pos = 0, 0
+    for i, (start, end, value) in enumerate(spans):
+        # Convert character offsets to byte offsets incrementally
+        byte_pos += len(text[char_pos:start].encode('utf-8'))
+        length = len(text[start:end].encode('utf-8'))
+        char_pos = end
+        sections.append({
+            "index": i,
+            "title": value.get("title", "") if isinstance(value, dict) else "",
+            "offset": byte_pos,
+            "length": length
+        })
+        byte_pos += length
+
+    stat = os.stat(report_path)
+    return {
+        "report": os.path.basename(report_path),
+        "report_date": report_date,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sections": sections
+    }
+
+
+def _index_path(report_path: str) -> str:
+    report_dir, filename = os.path.split(report_path)
+    return os.path.join(report_dir, INDEX_DIRNAME, filename)
+
+
+def write_report_index(report_path: str) -> dict:
+    """
+    Builds the section index of a report and saves it in the reports directory's index folder.
+    Called at ingest time so that reads never have to parse the full report.
+    """
+    index = build_report_index(report_path)
+    index_path = _index_path(report_path)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    logger.info(f"Indexed {len(index['sections'])} sections of {index['report']}")
+    return index
+
+
+def load_report_index(report_path: str) -> dict:
+    """
+    Returns the saved section index of a report, rebuilding it if missing or stale.
+    """
+    stat = os.stat(report_path)
+    try:
+        with open(_index_path(report_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("size") == stat.st_size and index.get("mtime_ns") == stat.st_mtime_ns:
+            return index
+        logger.info(f"Section index of {os.path.basename(report_path)} is stale. Rebuilding.")
+    except (FileNotFoundError, json.JSONDecodeError):
+        logger.info(f"No section index for {os.path.basename(report_path)}. Building it.")
+    return write_report_index(report_path)
+
+
+def index_reports(reports_dir: str) -> int:
+    """
+    Builds the section index of every report in a directory. Returns the number indexed.
+    """
+    count = 0
+    for fname in sorted(os.listdir(reports_dir)):
+        if not fname.endswith(".json"):
+            continue
+        try:
+            write_report_index(os.path.join(reports_dir, fname))
+            count += 1
+        except (ValueError, IOError) as e:
+            logger.warning(f"Could not index report '{fname}': {e}")
+    return count
+
+
+def _section_fields(value) -> tuple[str, str]:
+    """
+    Returns the (title, paragraph) of a content item; items that are not objects are
+    returned as an untitled paragraph.
+    """
+    if isinstance(value, dict):
+        return value.get("title", ""), value.get("paragraph", "")
+    return "", value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def read_report_sections(
+    report_path: str,
+    indices: list[int] = None,
+    title_match: str = None,
+    offset: int = 0,
+    max_bytes: int = REPORT_READ_MAX_BYTES
+) -> dict:
+    """
+    Reads selected sections of a report using its section index.
+
+    Sections are selected by index and/or by a case-insensitive substring of their
+    title. Without a selection, only the table of contents (index and title of each
+    section) is returned. At most `max_bytes` of section data are read per call;
+    `truncated` is set when some selected sections were left out. A first section
+    larger than the cap is cut and returned with a `next_offset`: passing it back as
+    `offset` continues that section's paragraph where the previous read stopped.
+    """
+    index = load_report_index(report_path)
+    sections = index["sections"]
+    result = {"report": index["report"], "report_date": index["report_date"]}
+
+    if not indices and not title_match:
+        result["table_of_contents"] = [{"index": s["index"], "title": s["title"]} for s in sections]
+        return result
+
+    selected = set(i for i in (indices or []) if 0 <= i < len(sections))
+    if title_match:
+        pattern = re.compile(re.escape(title_match), re.IGNORECASE)
+        selected.update(s["index"] for s in sections if pattern.search(s["title"]))
+
+    result["sections"] = []
+    result["truncated"] = False
+    used_bytes = 0
+    with open(report_path, 'rb') as f:
+        for i in sorted(selected):
+            section = sections[i]
+            first = not result["sections"]
+            if not first and used_bytes + section["length"] > max_bytes:
+                result["truncated"] = True
+                continue
+            f.seek(section["offset"])
+            title, paragraph = _section_fields(json.loads(f.read(section["length"]).decode('utf-8')))
+            entry = {"index": i, "title": title}
+            if first:
+                # Only the first section can be continued or cut
+                start = min(max(offset, 0), len(paragraph))
+                paragraph = paragraph[start:]
+                if start:
+                    entry["offset"] = start
+                if len(paragraph) > max_bytes:
+                    paragraph = paragraph[:max_bytes]
+                    entry["next_offset"] = start + max_bytes
+                    result["truncated"] = True
+                used_bytes += len(paragraph.encode('utf-8'))
+            else:
+                used_bytes += section["length"]
+            entry["paragraph"] = paragraph
+            result["sections"].append(entry)
+    return result
+
+
+if __name__ == "__main__":
+    # Example usage for CLI:
+    # python -m src.report_index <reports_dir>
+    import argparse
+    from src.config import REPORTS_JSON_DIR
+
+    parser = argparse.ArgumentParser(description="Build the section index of report JSON files.")
+    parser.add_argument("reports_dir", nargs="?", default=REPORTS_JSON_DIR, help="Directory containing report JSON files.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info(f"Indexed {index_reports(args.reports_dir)} reports in {args.reports_dir}")
@@ -0,0 +1,279 @@
+# src/resilience.py
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Callable
+import httpx
+from google.genai import errors
+from src.config import (
+    CALL_MAX_ATTEMPTS,
+    CALL_BACKOFF_BASE_SECONDS,
+    CALL_BACKOFF_MAX_SECONDS,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    LATENCY_WINDOW_SIZE
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call did not succeed before its deadline."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Returns True for transient failures: rate limits, server errors, timeouts and transport errors.
+    """
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (TimeoutError, httpx.TimeoutException, httpx.TransportError, ConnectionError))
+
+
+class CallMetrics:
+    """
+    Thread-safe counters and a rolling latency window for one kind of call.
+    """
+
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window_size)
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0,
+            "attempt_timeouts": 0, "deadline_exceeded": 0, "hedges_sent": 0, "hedge_wins": 0,
+            "attempts_running": 0
+        }
+
+    def increment(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def record_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Returns the q-th percentile (0-100) of recent successful attempt latencies, in seconds.
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            samples = len(self._latencies)
+        return {
+            **counters,
+            "latency_samples": samples,
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95),
+            "p99_seconds": self.percentile(99)
+        }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(name: str) -> CallMetrics:
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = CallMetrics()
+        return _metrics[name]
+
+
+def metrics_snapshot() -> dict:
+    """
+    Returns the metrics of every kind of call made through `resilient_call`.
+    """
+    with _metrics_lock:
+        names = list(_metrics)
+    return {name: get_metrics(name).snapshot() for name in names}
+
+
+def _timed(fn: Callable, metrics: CallMetrics) -> Callable:
+    def _run():
+        started = time.monotonic()
+        result = fn()
+        metrics.record_latency(time.monotonic() - started)
+        return result
+    return _run
+
+
+def _hedge_delay(metrics: CallMetrics) -> float:
+    p95 = metrics.percentile(95) if metrics.sample_count() >= HEDGE_MIN_SAMPLES else None
+    return max(p95 or 0.0, HEDGE_MIN_DELAY_SECONDS)
+
+
+class _AttemptGroup:
+    """
+    Runs the attempts of one call, each on its own thread, and reports when the call
+    has settled: it has returned or raised, and every attempt it started has finished.
+
+    A thread per attempt means that attempts abandoned on timeout, which cannot be
+    interrupted, never hold up new attempts the way a saturated pool would.
+    """
+
+    def __init__(self, metrics: CallMetrics, on_settled: Callable[[], None] = None):
+        self._metrics = metrics
+        self._on_settled = on_settled
+        self._lock = threading.Lock()
+        self._running = 0
+        self._closed = False
+
+    def start(self, fn: Callable) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def _run():
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._finished()
+
+        with self._lock:
+            self._running += 1
+        self._metrics.increment("attempts_running")
+        try:
+            threading.Thread(target=_run, name="model-call", daemon=True).start()
+        except BaseException:
+            self._finished()
+            raise
+        return future
+
+    def _finished(self):
+        self._metrics.increment("attempts_running", -1)
+        with self._lock:
+            self._running -= 1
+            settled = self._closed and self._running == 0
+        if settled and self._on_settled:
+            self._on_settled()
+
+    def close(self):
+        """
+        Marks the call as done; `on_settled` runs now or when its last attempt finishes.
+        """
+        with self._lock:
+            self._closed = True
+            settled = self._running == 0
+        if settled and self._on_settled:
+            self._on_settled()
+
+
+def _attempt(group: _AttemptGroup, fn: Callable, metrics: CallMetrics, timeout: float, hedge: bool):
+    """
+    Runs one attempt (plus an optional hedge) and returns its result, raising its error
+    or TimeoutError if nothing succeeded within `timeout` seconds. Attempts still
+    running when this returns are left to finish in the background.
+    """
+    ends_at = time.monotonic() + timeout
+    primary = group.start(_timed(fn, metrics))
+    pending = {primary}
+
+    if hedge:
+        done, _ = wait(pending, timeout=min(_hedge_delay(metrics), timeout))
+        if not done:
+            metrics.increment("hedges_sent")
+            pending.add(group.start(_timed(fn, metrics)))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(ends_at - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if future is not primary:
+                    metrics.increment("hedge_wins")
+                return future.result()
+            error = future.exception()
+
+    if pending:
+        metrics.increment("attempt_timeouts")
+        raise TimeoutError(f"Attempt did not complete within {timeout:.1f}s.")
+    raise error
+
+
+def resilient_call(
+    name: str,
+    fn: Callable,
+    deadline: float,
+    attempt_timeout: float = None,
+    max_attempts: int = CALL_MAX_ATTEMPTS,
+    hedge: bool = False,
+    retryable: Callable[[BaseException], bool] = is_retryable,
+    on_settled: Callable[[], None] = None
+):
+    """
+    Calls `fn()` with a total deadline, retrying retryable failures with exponential
+    backoff and full jitter.
+
+    Each attempt is bounded by `attempt_timeout` seconds (and by the time left before
+    the deadline). With `hedge=True`, which must only be used for idempotent calls, a
+    second request is sent if the first has not answered after the recent p95 latency
+    of `name` calls, and the first response wins. Timed-out attempts cannot be
+    interrupted; callers should also pass the timeout to the underlying client.
+    `on_settled` is called once the call has returned or raised and all of its attempts,
+    abandoned ones included, have finished: use it to release capacity held for the call.
+    Metrics are recorded under `name` (see `metrics_snapshot`).
+    """
+    group = _AttemptGroup(get_metrics(name), on_settled)
+    try:
+        return _call_with_retries(group, name, fn, deadline, attempt_timeout, max_attempts, hedge, retryable)
+    finally:
+        group.close()
+
+
+def _call_with_retries(group: _AttemptGroup, name: str, fn: Callable, deadline: float, attempt_timeout: float,
+                       max_attempts: int, hedge: bool, retryable: Callable[[BaseException], bool]):
+    metrics = get_metrics(name)
+    metrics.increment("calls")
+    ends_at = time.monotonic() + deadline
+    last_error = None
+
+    for attempt in range(max_attempts):
+        remaining = ends_at - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            result = _attempt(group, fn, metrics, min(attempt_timeout or remaining, remaining), hedge)
+            metrics.increment("successes")
+            return result
+        except Exception as e:
+            last_error = e
+            if not retryable(e) or attempt == max_attempts - 1:
+                metrics.increment("failures")
+                if isinstance(e, TimeoutError):
+                    metrics.increment("deadline_exceeded")
+                    raise DeadlineExceeded(f"{name} call timed out: {e}") from e
+                raise
+            backoff = random.uniform(0, min(CALL_BACKOFF_MAX_SECONDS, CALL_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            if time.monotonic() + backoff >= ends_at:
+                break
+            logger.warning(f"{name} attempt {attempt + 1} failed ({e}). Retrying in {backoff:.2f}s.")
+            metrics.increment("retries")
+            time.sleep(backoff)
+
+    metrics.increment("failures")
+    if last_error is not None and not isinstance(last_error, TimeoutError):
+        # No time left to retry an upstream error (e.g. 429 or 503): report it as such
+        raise last_error
+    metrics.increment("deadline_exceeded")
+    raise DeadlineExceeded(f"{name} call did not succeed within its {deadline:.1f}s deadline.") from last_error
@@ -1,6 +1,11 @@
 import os, sys
+import re
 import json
+import time
+import heapq
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pinecone import Pinecone, ServerlessSpec
 from tqdm import tqdm # Assuming tqdm is installed
 from src.config import (
@@ -11,8 +16,17 @@ from src.config import (
     PINECONE_CLOUD,
     PINECONE_REGION,
     PINECONE_BATCH_SIZE,
-    EMBEDDINGS_REPORTS_DIR
+    SHARD_BY,
+    SHARD_QUERY_MAX_WORKERS,
+    SHARD_LIST_TTL_SECONDS,
+    RRF_K,
+    EMBEDDINGS_REPORTS_DIR,
+    EMBEDDINGS_QUESTIONS_DIR,
+    CONTEXT_TOKEN_BUDGET,
+    ANN_INDEX_PATH
 )
+from src.chunking import pack_context, format_context
+from src.ann_index import IVFIndex, benchmark
 
 # Configure logging for this module
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -90,7 +104,98 @@ def load_embedding_vectors(data_dir: str = EMBEDDINGS_REPORTS_DIR) -> list:
     logger.info(f"Successfully loaded {len(vectors)} embedding files.")
     return vectors
 
-def upsert_vectors_to_pinecone(index, vectors: list, batch_size: int = PINECONE_BATCH_SIZE):
+def shard_namespace(metadata: dict, shard_by: str = SHARD_BY) -> str:
+    """
+    Returns the namespace a vector belongs to, derived from its report metadata:
+    - "report_type": company, economics or strategy
+    - "company": one shard per company, plus one per non-corporate report type
+    - "period": one shard per quarter of the report date (DD/MM/YYYY)
+    Shard namespaces are named "<NAMESPACE>-<shard_by>-<shard>", so that shards of a
+    previous SHARD_BY setting are never queried alongside the current ones.
+    """
+    if not shard_by:
+        return NAMESPACE
+
+    report_name = metadata.get("report_name", "")
+    report_type = report_name.split("_", 1)[0] or "other"
+    if shard_by == "report_type":
+        shard = report_type
+    elif shard_by == "company":
+        match = re.match(r"company_report_([A-Za-z0-9]+)", report_name)
+        shard = f"company-{match.group(1)}" if match else report_type
+    elif shard_by == "period":
+        match = re.search(r"(\d{1,2})/(\d{4})$", metadata.get("report_date") or "")
+        shard = f"{match.group(2)}-q{(int(match.group(1)) - 1) // 3 + 1}" if match else "undated"
+    else:
+        raise ValueError(f"Unknown shard key: '{shard_by}'")
+    return f"{NAMESPACE}-{shard_by}-{shard}"
+
+def _in_scheme(namespace: str, shard_by: str) -> bool:
+    return namespace == NAMESPACE if not shard_by else namespace.startswith(f"{NAMESPACE}-{shard_by}-")
+
+# Index name -> (fetched_at, namespaces under NAMESPACE), so queries don't each call describe_index_stats
+_shard_cache = {}
+_shard_cache_lock = threading.Lock()
+
+def _namespaces(index, refresh: bool = False) -> list:
+    """
+    Returns the namespaces of the index that belong to NAMESPACE (itself or any shard),
+    cached for SHARD_LIST_TTL_SECONDS.
+    """
+    with _shard_cache_lock:
+        cached = _shard_cache.get(index.name)
+    if cached and not refresh and time.monotonic() - cached[0] < SHARD_LIST_TTL_SECONDS:
+        return list(cached[1])
+
+    namespaces = index.describe_index_stats().namespaces
+    owned = sorted(ns for ns in namespaces if ns == NAMESPACE or ns.startswith(f"{NAMESPACE}-"))
+    with _shard_cache_lock:
+        _shard_cache[index.name] = (time.monotonic(), owned)
+    return list(owned)
+
+def list_shards(index, shard_by: str = SHARD_BY, refresh: bool = False) -> list:
+    """
+    Lists the shard namespaces of the current sharding scheme (`shard_by`).
+    The list is cached for SHARD_LIST_TTL_SECONDS and updated by `upsert_sharded_vectors`;
+    pass `refresh=True` to fetch it again.
+    """
+    return [ns for ns in _namespaces(index, refresh) if _in_scheme(ns, shard_by)]
+
+def route_namespaces(index, report_types: list = None, companies: list = None, shard_by: str = SHARD_BY) -> list:
+    """
+    Returns the shards that can hold reports of the given types (company, economics,
+    strategy) or companies (tickers), to query only those. Returns every shard when no
+    filter is given or the scheme can't narrow it down (e.g. "period").
+    """
+    shards = list_shards(index, shard_by)
+    if not (report_types or companies) or shard_by not in ("report_type", "company"):
+        return shards
+
+    wanted = set()
+    for report_type in report_types or []:
+        if shard_by == "company" and report_type == "company":
+            wanted.update(ns for ns in shards if ns.startswith(f"{NAMESPACE}-company-company-"))
+        else:
+            wanted.add(shard_namespace({"report_name": f"{report_type}_report"}, shard_by))
+    for company in companies or []:
+        wanted.add(shard_namespace({"report_name": f"company_report_{company}"}, shard_by))
+    return [ns for ns in shards if ns in wanted]
+
+def delete_stale_shards(index, shard_by: str = SHARD_BY) -> list:
+    """
+    Deletes the namespaces under NAMESPACE that don't belong to the current sharding
+    scheme, e.g. after SHARD_BY changed and the vectors were upserted again.
+    Returns the namespaces deleted.
+    """
+    stale = [ns for ns in _namespaces(index, refresh=True) if not _in_scheme(ns, shard_by)]
+    for namespace in stale:
+        index.delete(delete_all=True, namespace=namespace)
+        logger.info(f"Deleted stale namespace '{namespace}'.")
+    with _shard_cache_lock:
+        _shard_cache.pop(index.name, None)
+    return stale
+
+def upsert_vectors_to_pinecone(index, vectors: list, batch_size: int = PINECONE_BATCH_SIZE, namespace: str = None):
     """
     Upserts a list of vectors to the Pinecone index in batches.
     """
@@ -98,17 +203,34 @@ def upsert_vectors_to_pinecone(index, vectors: list, batch_size: int = PINECONE_
         logger.info("No vectors to upsert.")
         return
 
-    logger.info(f"Starting upsert of {len(vectors)} vectors to index '{index.name}'...")
+    logger.info(f"Starting upsert of {len(vectors)} vectors to index '{index.name}' (namespace '{namespace or ''}')...")
     try:
         for start in tqdm(range(0, len(vectors), batch_size), desc="Upserting records batch"):
             batch = vectors[start:start+batch_size]
-            index.upsert(vectors=batch)
+            index.upsert(vectors=batch, namespace=namespace)
         logger.info(f"Successfully upserted {len(vectors)} vectors.")
     except Exception as e:
         logger.error(f"Error during vector upsert: {e}", exc_info=True)
         raise
 
-def query_pinecone_index(index, query_vector: list, top_k: int = 5, include_metadata: bool = True):
+def upsert_sharded_vectors(index, vectors: list, shard_by: str = SHARD_BY) -> list:
+    """
+    Groups vectors by shard namespace and upserts each group. Returns the namespaces written.
+    """
+    shards = {}
+    for vector in vectors:
+        shards.setdefault(shard_namespace(vector.get("metadata", {}), shard_by), []).append(vector)
+    for namespace, shard_vectors in sorted(shards.items()):
+        upsert_vectors_to_pinecone(index, shard_vectors, namespace=namespace)
+
+    # Index stats are eventually consistent: add the new shards to the cached list directly
+    with _shard_cache_lock:
+        cached = _shard_cache.get(index.name)
+        if cached:
+            _shard_cache[index.name] = (cached[0], sorted(set(cached[1]) | set(shards)))
+    return sorted(shards)
+
+def query_pinecone_index(index, query_vector: list, top_k: int = 5, include_metadata: bool = True, include_values: bool = False, namespace: str = None):
     """
     Queries the Pinecone index with a given query vector.
     """
@@ -117,12 +239,14 @@ def query_pinecone_index(index, query_vector: list, top_k: int = 5, include_meta
     if not query_vector:
         raise ValueError("Query vector cannot be empty.")
 
-    logger.info(f"Querying index '{index.name}' for top {top_k} results...")
+    logger.info(f"Querying index '{index.name}' (namespace '{namespace or ''}') for top {top_k} results...")
     try:
         query_results = index.query(
             vector=query_vector,
             top_k=top_k,
-            include_metadata=include_metadata
+            include_metadata=include_metadata,
+            include_values=include_values,
+            namespace=namespace
         )
         logger.info("Query successful.")
         return query_results
@@ -130,22 +254,160 @@ def query_pinecone_index(index, query_vector: list, top_k: int = 5, include_meta
         logger.error(f"Error during Pinecone query: {e}", exc_info=True)
         raise
 
+def _query_shards_ranked(index, query_vectors: list, namespaces: list, top_k: int, include_values: bool) -> list:
+    """
+    Queries every (query vector, shard) pair concurrently and returns, per query vector,
+    its matches across all shards merged into a single top-k list.
+    The pool is sized to the number of pairs (up to SHARD_QUERY_MAX_WORKERS), so that
+    adding shards or reformulations doesn't queue queries behind each other.
+    """
+    workers = max(1, min(len(query_vectors) * len(namespaces), SHARD_QUERY_MAX_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-query") as executor:
+        futures = [
+            [executor.submit(query_pinecone_index, index, vector, top_k=top_k,
+                             include_values=include_values, namespace=namespace)
+             for namespace in namespaces]
+            for vector in query_vectors
+        ]
+        return [_merge_shard_results(namespaces, shard_futures, top_k) for shard_futures in futures]
+
+def _merge_shard_results(namespaces: list, shard_futures: list, top_k: int) -> list:
+    """
+    Merges the results of one query vector across shards into its top-k matches.
+    """
+    matches = []
+    failures = 0
+    for namespace, future in zip(namespaces, shard_futures):
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.warning(f"Query of shard '{namespace}' failed, merging the other shards: {e}")
+            failures += 1
+            continue
+        matches.extend({**match.to_dict(), "namespace": namespace} for match in results.matches)
+    if namespaces and failures == len(namespaces):
+        raise RuntimeError("All shard queries failed.")
+    return heapq.nlargest(top_k, matches, key=lambda m: m["score"])
+
+def query_shards(index, query_vector: list, namespaces: list = None, top_k: int = 5, include_values: bool = False) -> list:
+    """
+    Fans a query out to the given shard namespaces (all shards by default) concurrently
+    and returns the merged top-k matches as dicts, each tagged with its namespace.
+    """
+    namespaces = namespaces or list_shards(index)
+    return _query_shards_ranked(index, [query_vector], namespaces, top_k, include_values)[0]
+
+def multi_query(index, query_vectors: list, namespaces: list = None, top_k: int = 5, include_values: bool = False) -> list:
+    """
+    Runs several reformulations of a question (as embedding vectors) against all shards
+    in parallel and fuses their rankings with reciprocal rank fusion.
+    Returns the top-k fused matches, each with its `fused_score`.
+    """
+    namespaces = namespaces or list_shards(index)
+    fused = {}
+    for matches in _query_shards_ranked(index, query_vectors, namespaces, top_k, include_values):
+        for rank, match in enumerate(matches):
+            entry = fused.setdefault(match["id"], {**match, "fused_score": 0.0})
+            entry["fused_score"] += 1.0 / (RRF_K + rank + 1)
+            entry["score"] = max(entry["score"], match["score"])
+    return heapq.nlargest(top_k, fused.values(), key=lambda m: m["fused_score"])
+
+def retrieve_context(index, query_vector: list, token_budget: int = CONTEXT_TOKEN_BUDGET, top_k: int = 20, namespaces: list = None) -> str:
+    """
+    Retrieves the top matching chunks across shards and packs them into a prompt-ready
+    context string that fits within `token_budget` tokens.
+    """
+    matches = query_shards(index, query_vector, namespaces=namespaces, top_k=top_k, include_values=True)
+    blocks = pack_context(matches, token_budget=token_budget)
+    logger.info(f"Packed {len(blocks)} context blocks from {len(matches)} matches.")
+    return format_context(blocks)
+
+def build_local_index(data_dir: str = EMBEDDINGS_REPORTS_DIR, index_path: str = ANN_INDEX_PATH,
+                      retrain: bool = False) -> IVFIndex:
+    """
+    Syncs the local IVF index at `index_path` (created if it does not exist yet) with the
+    embedding vectors in `data_dir` and saves it: only new or changed vectors are inserted,
+    and vectors whose file was deleted are removed. The index trains itself once it
+    holds enough vectors and retrains as it grows; `retrain=True` forces a new clustering.
+    """
+    if os.path.exists(index_path):
+        local_index = IVFIndex.load(index_path)
+    else:
+        local_index = IVFIndex()
+
+    added, removed = local_index.sync(load_embedding_vectors(data_dir))
+    logger.info(f"Local index: {added} vectors added or updated, {removed} removed.")
+    if retrain and len(local_index):
+        local_index.train()
+    elif not local_index.is_trained:
+        logger.info(f"Local index holds {len(local_index)} vectors, too few to train; queries scan all of them.")
+    local_index.save(index_path)
+    return local_index
+
+def query_local_index(local_index: IVFIndex, query_vector: list, top_k: int = 5, n_probe: int = None) -> list:
+    """
+    Queries the local IVF index with a given query vector.
+    """
+    if not query_vector:
+        raise ValueError("Query vector cannot be empty.")
+    return local_index.search(query_vector, top_k=top_k, n_probe=n_probe)
+
+def load_question_embeddings(data_dir: str = EMBEDDINGS_QUESTIONS_DIR) -> list:
+    """
+    Loads question embedding vectors from JSON files in a specified directory.
+    """
+    questions = []
+    if not os.path.exists(data_dir):
+        logger.error(f"Data directory not found: {data_dir}")
+        return []
+
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith(".json"):
+            try:
+                with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+                    values = json.load(f).get("values")
+                if values:
+                    questions.append(values)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping file '{filename}' due to a JSON decoding error.")
+
+    logger.info(f"Successfully loaded {len(questions)} question embeddings.")
+    return questions
+
 if __name__ == "__main__":
     # Example usage for CLI:
     # python src/vector_db.py init
     # python src/vector_db.py upsert
+    # python src/vector_db.py prune-shards
     # python src/vector_db.py query <path_to_question_json>
+    # python src/vector_db.py ann-build [--retrain]
+    # python src/vector_db.py ann-bench
 
     import argparse
-    from gen_embed import get_embedding # Needed for test query
 
     parser = argparse.ArgumentParser(description="Manage Pinecone vector database.")
-    parser.add_argument("action", choices=["init", "upsert", "query"],
-                        help="Specify 'init' to create/get index, 'upsert' to load and upload vectors, or 'query' to test a query.")
+    parser.add_argument("action", choices=["init", "upsert", "prune-shards", "query", "context", "ann-build", "ann-bench"],
+                        help="Specify 'init' to create/get index, 'upsert' to load and upload vectors, 'prune-shards' to delete namespaces of a previous SHARD_BY, "
+                             "'query' to test a query, 'context' to test context packing, "
+                             "'ann-build' to build the local approximate index, or 'ann-bench' to benchmark it against exact search.")
     parser.add_argument("--query_file", type=str,
                         help="Path to a JSON file containing a question embedding (for 'query' action).")
+    parser.add_argument("--retrain", action="store_true",
+                        help="Recluster the local approximate index from scratch (for 'ann-build' action).")
     args = parser.parse_args()
 
+    if args.action == "ann-build":
+        build_local_index(retrain=args.retrain)
+        sys.exit(0)
+    if args.action == "ann-bench":
+        local_index = IVFIndex.load(ANN_INDEX_PATH)
+        records = [{"id": _id, "values": v, "metadata": m}
+                   for _id, v, m in zip(local_index.ids, local_index.vectors, local_index.metadata)]
+        for row in benchmark(local_index, records, load_question_embeddings()):
+            print(f"n_probe={row['n_probe']:>3}  recall={row['recall']:.3f}  "
+                  f"latency={row['latency_ms']:.2f}ms  exact={row['exact_latency_ms']:.2f}ms")
+        sys.exit(0)
+
     if not pc:
         logger.error("Pinecone client not available. Exiting.")
         sys.exit(1) # Exit if client didn't initialize
@@ -158,11 +420,14 @@ if __name__ == "__main__":
         elif args.action == "upsert":
             pinecone_index = get_or_create_pinecone_index(pc) # Ensure index exists
             vectors_to_upload = load_embedding_vectors()
-            upsert_vectors_to_pinecone(pinecone_index, vectors_to_upload)
+            upsert_sharded_vectors(pinecone_index, vectors_to_upload)
             logger.info("Vector upsert complete.")
-        elif args.action == "query":
+        elif args.action == "prune-shards":
+            pinecone_index = get_or_create_pinecone_index(pc)
+            logger.info(f"Deleted {len(delete_stale_shards(pinecone_index))} stale namespaces.")
+        elif args.action in ("query", "context"):
             if not args.query_file:
-                parser.error("--query_file is required for 'query' action.")
+                parser.error(f"--query_file is required for '{args.action}' action.")
 
             pinecone_index = get_or_create_pinecone_index(pc) # Ensure index exists
             try:
@@ -176,9 +441,12 @@ if __name__ == "__main__":
                     sys.exit(1)
 
                 logger.info(f"Querying with question: {question_txt}")
-                query_results = query_pinecone_index(pinecone_index, question_vec, top_k=2)
-                print(f"Results for '{question_txt}':")
-                print(json.dumps(query_results.to_dict(), indent=2)) # .to_dict() to pretty print Pinecone results
+                if args.action == "context":
+                    print(retrieve_context(pinecone_index, question_vec))
+                else:
+                    matches = query_shards(pinecone_index, question_vec, top_k=2)
+                    print(f"Results for '{question_txt}':")
+                    print(json.dumps(matches, indent=2))
 
             except FileNotFoundError:
                 logger.error(f"Query file not found: {args.query_file}")
@@ -0,0 +1,61 @@
+import random
+
+from src.ann_index import IVFIndex
+
+
+def _records(count, dimension=8, seed=0, prefix="v"):
+    rng = random.Random(seed)
+    return [{"id": f"{prefix}{i}", "values": [rng.gauss(0, 1) for _ in range(dimension)], "metadata": {"i": i}}
+            for i in range(count)]
+
+
+def test_index_trains_only_with_enough_vectors_and_retrains_as_it_grows():
+    index = IVFIndex(n_lists=4, n_probe=2)
+    index.add(_records(31))
+    assert not index.is_trained
+
+    index.add(_records(1, seed=1, prefix="w"))
+    assert index.is_trained and index.trained_size == 32
+
+    index.add(_records(31, seed=2, prefix="x"))
+    assert index.trained_size == 32
+    index.add(_records(1, seed=3, prefix="y"))
+    assert index.trained_size == 64
+
+
+def test_save_and_load_round_trip_through_the_binary_vector_file(tmp_path):
+    index = IVFIndex(n_lists=4, n_probe=2)
+    index.add(_records(40))
+    path = tmp_path / "ivf_index.json"
+    index.save(str(path))
+
+    loaded = IVFIndex.load(str(path))
+
+    assert (tmp_path / "ivf_index.f32").exists()
+    assert loaded.ids == index.ids and loaded.lists == index.lists and loaded.trained_size == 40
+    query = _records(1, seed=9)[0]["values"]
+    assert [m["id"] for m in loaded.search(query, top_k=5)] == [m["id"] for m in index.search(query, top_k=5)]
+
+
+def test_empty_index_can_be_saved_and_loaded(tmp_path):
+    path = tmp_path / "ivf_index.json"
+    IVFIndex().save(str(path))
+
+    loaded = IVFIndex.load(str(path))
+
+    assert len(loaded) == 0 and loaded.search([1.0, 0.0], top_k=3) == []
+
+
+def test_sync_only_inserts_new_or_changed_records_and_removes_missing_ones():
+    records = _records(40)
+    index = IVFIndex(n_lists=4, n_probe=4)
+    assert index.sync(records) == (40, 0)
+
+    changed = {**records[5], "metadata": {"i": "edited"}}
+    kept = records[:5] + [changed] + records[6:30]
+    assert index.sync(kept + _records(2, seed=4, prefix="n")) == (3, 10)
+
+    assert sorted(index.ids) == sorted([r["id"] for r in kept] + ["n0", "n1"])
+    assert sorted(p for members in index.lists for p in members) == list(range(len(index)))
+    for record in kept:
+        assert index.search(record["values"], top_k=1, n_probe=4)[0]["id"] == record["id"]
@@ -0,0 +1,43 @@
+from src.chunking import chunk_report, pack_context, estimate_tokens
+
+
+def _long_paragraph(num_words):
+    return " ".join(f"word{i}" for i in range(num_words))
+
+
+def test_long_paragraphs_fill_windows_up_to_the_token_limit():
+    chunks = chunk_report("report", "01/01/2025", [{"title": "Outlook", "paragraph": _long_paragraph(2000)}],
+                          max_tokens=400, overlap_tokens=50)
+
+    assert len(chunks) > 1
+    assert all(c["metadata"]["token_count"] <= 400 for c in chunks)
+    # Every window but the last is filled close to the limit
+    assert all(c["metadata"]["token_count"] >= 380 for c in chunks[:-1])
+    assert [c["id"] for c in chunks] == [f"report-0-{j}" for j in range(len(chunks))]
+    assert all(c["text"].startswith("Outlook\n\n") for c in chunks)
+
+
+def test_short_paragraphs_are_merged():
+    content = [{"title": "A", "paragraph": "Short one."}, {"title": "B", "paragraph": "Short two."}]
+    chunks = chunk_report("report", "01/01/2025", content, min_tokens=40)
+
+    assert len(chunks) == 1
+    assert chunks[0]["metadata"]["last_paragraph_index"] == 1
+
+
+def test_pack_context_merges_adjacent_chunks_and_drops_duplicates():
+    chunks = chunk_report("report", "01/01/2025", [{"title": "T", "paragraph": _long_paragraph(600)}],
+                          max_tokens=200, overlap_tokens=20)
+    matches = [
+        {"id": c["id"], "score": 0.9 - 0.01 * i, "values": [1.0, float(i)], "metadata": c["metadata"]}
+        for i, c in enumerate(chunks[:2])
+    ]
+    duplicate = {**matches[0], "id": "copy", "score": 0.85}
+
+    blocks = pack_context(matches + [duplicate], token_budget=1000, duplicate_threshold=0.99)
+
+    assert len(blocks) == 1
+    assert blocks[0]["ids"] == [chunks[0]["id"], chunks[1]["id"]]
+    # The overlap between consecutive windows is not repeated
+    assert blocks[0]["text"].split().count(chunks[1]["metadata"]["paragraph_text"].split()[0]) == 1
+    assert estimate_tokens(blocks[0]["text"]) <= 1000
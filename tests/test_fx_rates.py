@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from src.fx_rates import FxRateClient, FxRateError
+
+
+def test_failed_fetch_backs_off_before_retrying():
+    calls = []
+
+    def failing_fetch():
+        calls.append(1)
+        raise ConnectionError("upstream down")
+
+    client = FxRateClient(fetch=failing_fetch, failure_backoff=60)
+    for _ in range(3):
+        with pytest.raises(FxRateError):
+            client.get_rates()
+
+    assert len(calls) == 1
+
+
+def test_stale_rates_are_served_while_another_thread_refreshes():
+    fetching, release = threading.Event(), threading.Event()
+    responses = iter([("2025-01-01", {"USD": 1.0}), ("2025-01-02", {"USD": 2.0})])
+
+    def fetch():
+        date, rates = next(responses)
+        if date == "2025-01-02":
+            fetching.set()
+            release.wait(5)
+        return date, rates
+
+    client = FxRateClient(fetch=fetch, ttl_seconds=0)
+    assert client.get_rates()[0] == "2025-01-01"
+
+    refreshed = []
+    refresher = threading.Thread(target=lambda: refreshed.append(client.get_rates()[0]))
+    refresher.start()
+    try:
+        assert fetching.wait(5)
+        # The refresh is blocked upstream, without holding the cache lock
+        assert client.convert(10, "EUR", "USD") == 10.0
+    finally:
+        release.set()
+        refresher.join()
+    assert refreshed == ["2025-01-02"]
+
+
+def test_unsupported_currency_lists_the_supported_ones():
+    client = FxRateClient(fetch=lambda: ("2025-01-01", {"USD": 1.1}))
+    result = client.convert_batch([(1, "USD", "VND")])[0]
+
+    assert "VND" in result["error"] and "EUR, USD" in result["error"]
+
+
+def test_batch_uses_a_single_snapshot():
+    snapshots = iter([("2025-01-01", {"USD": 1.0}), ("2025-01-02", {"USD": 2.0})])
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return next(snapshots)
+
+    client = FxRateClient(fetch=fetch, ttl_seconds=0)
+    results = client.convert_batch([(1, "EUR", "USD"), (2, "EUR", "USD")])
+
+    assert len(calls) == 1
+    assert [(r["date"], r["converted_amount"]) for r in results] == [("2025-01-01", 1.0), ("2025-01-01", 2.0)]
@@ -0,0 +1,78 @@
+import os
+import json
+
+from src.gen_embed import generate_report_embeddings, DEDUP_LINKS_FILENAME
+
+SHORT_NOTE = "Vinamilk kept its dividend policy unchanged for the year."
+LONG_ANALYSIS = " ".join(f"Steel demand in region {i} recovered on infrastructure spending." for i in range(20))
+
+
+def _write_report(directory, name, content):
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump({"report_date": "01/06/2025", "content": content}, f)
+
+
+def test_duplicates_link_to_the_chunks_holding_their_canonical_paragraph(tmp_path):
+    source_dir, save_dir = tmp_path / "json", tmp_path / "embeddings"
+    source_dir.mkdir()
+    # Paragraphs 0 and 1 are short and get merged into chunk "a_report-0-0"
+    _write_report(source_dir, "a_report", [
+        {"title": "Dividends", "paragraph": "Dividend outlook remains stable."},
+        {"title": "Dairy", "paragraph": SHORT_NOTE},
+        {"title": "Steel", "paragraph": LONG_ANALYSIS},
+    ])
+    _write_report(source_dir, "b_report", [
+        {"title": "Dairy", "paragraph": SHORT_NOTE},
+        {"title": "Steel", "paragraph": LONG_ANALYSIS},
+    ])
+
+    vectors = generate_report_embeddings(str(source_dir), str(save_dir), embed_fn=lambda text: [1.0], request_delay=0)
+
+    ids = {v["id"] for v in vectors}
+    assert not any(_id.startswith("b_report") for _id in ids)
+    with open(save_dir / DEDUP_LINKS_FILENAME, encoding="utf-8") as f:
+        links = json.load(f)["links"]
+    assert links["b_report-0"] == {"canonical_paragraph": "a_report-1", "chunk_ids": ["a_report-0-0"]}
+    assert links["b_report-1"]["canonical_paragraph"] == "a_report-2"
+    assert links["b_report-1"]["chunk_ids"] and set(links["b_report-1"]["chunk_ids"]) <= ids
+
+
+def test_stale_chunk_files_are_removed_when_a_report_is_re_chunked(tmp_path):
+    source_dir, save_dir = tmp_path / "json", tmp_path / "embeddings"
+    source_dir.mkdir()
+    save_dir.mkdir()
+    (save_dir / "a_report-0.json").write_text("{}", encoding="utf-8")  # Embedding from before chunking
+    _write_report(source_dir, "a_report", [{"title": "Steel", "paragraph": LONG_ANALYSIS * 3}])
+    first = generate_report_embeddings(str(source_dir), str(save_dir), embed_fn=lambda text: [1.0], request_delay=0)
+    assert len(first) > 1
+
+    _write_report(source_dir, "a_report", [{"title": "Steel", "paragraph": LONG_ANALYSIS}])
+    second = generate_report_embeddings(str(source_dir), str(save_dir), embed_fn=lambda text: [1.0], request_delay=0)
+
+    assert [v["id"] for v in second] == ["a_report-0-0"]
+    assert sorted(os.listdir(save_dir)) == [DEDUP_LINKS_FILENAME, "a_report-0-0.json"]
+
+
+def test_first_ingested_copy_stays_canonical_across_runs(tmp_path):
+    source_dir, save_dir = tmp_path / "json", tmp_path / "embeddings"
+    source_dir.mkdir()
+
+    def ingest():
+        return generate_report_embeddings(str(source_dir), str(save_dir), embed_fn=lambda text: [1.0], request_delay=0)
+
+    _write_report(source_dir, "m_report", [{"title": "Steel", "paragraph": LONG_ANALYSIS}])
+    _write_report(source_dir, "z_report", [{"title": "Dairy", "paragraph": SHORT_NOTE * 4}])
+    ingest()
+
+    # a_report sorts first but was ingested last; z_report is edited into a duplicate
+    _write_report(source_dir, "a_report", [{"title": "Steel", "paragraph": LONG_ANALYSIS}])
+    _write_report(source_dir, "z_report", [{"title": "Steel", "paragraph": LONG_ANALYSIS}])
+    assert ingest() == []
+
+    with open(save_dir / DEDUP_LINKS_FILENAME, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["reports"] == ["m_report", "z_report", "a_report"]
+    assert {dup: link["canonical_paragraph"] for dup, link in report["links"].items()} == {
+        "z_report-0": "m_report-0", "a_report-0": "m_report-0"
+    }
+    assert sorted(f for f in os.listdir(save_dir) if f.endswith(".json")) == ["m_report-0-0.json"]
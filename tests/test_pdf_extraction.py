@@ -0,0 +1,100 @@
+import os
+import json
+
+import pypdf
+
+from src import pdf_extraction
+
+
+def _write_pdf(path, num_pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(num_pages):
+        writer.add_blank_page(width=100, height=100)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+class StubExtractor:
+    """Returns one paragraph per page range; only the first range carries the report date."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, pdf_bytes):
+        self.calls += 1
+        report_date = "05/06/2025" if self.calls == 1 else None
+        return json.dumps({
+            "report_date": report_date,
+            "content": [{"title": f"Section {self.calls}", "paragraph": f"Unique findings number {self.calls}."}]
+        })
+
+
+def test_pipeline_extracts_caches_and_embeds_offline(tmp_path):
+    pdf_dir, json_dir, embeddings_dir = tmp_path / "pdf", tmp_path / "json", tmp_path / "embeddings"
+    pdf_dir.mkdir()
+    _write_pdf(pdf_dir / "company_report_HPG.pdf", num_pages=25)
+
+    extractor = StubExtractor()
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return [0.1, 0.2, 0.3]
+
+    vectors = pdf_extraction.run_pipeline(
+        str(pdf_dir), str(json_dir), str(embeddings_dir),
+        extract_fn=extractor, max_workers=1, embed_fn=embed, request_delay=0
+    )
+
+    # 25 pages are split into 3 page ranges; dates missing from later ranges are fine
+    assert extractor.calls == 3
+    with open(json_dir / "company_report_HPG.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["report_date"] == "05/06/2025"
+    assert [p["title"] for p in report["content"]] == ["Section 1", "Section 2", "Section 3"]
+    assert vectors and len(embedded) == len(vectors)
+    assert all(os.path.exists(embeddings_dir / f"{v['id']}.json") for v in vectors)
+
+    # Unchanged PDFs and existing embeddings are skipped on the next run
+    vectors = pdf_extraction.run_pipeline(
+        str(pdf_dir), str(json_dir), str(embeddings_dir),
+        extract_fn=extractor, max_workers=1, embed_fn=embed, request_delay=0
+    )
+    assert extractor.calls == 3
+    assert vectors == []
+
+
+def test_report_without_any_date_is_rejected(tmp_path):
+    pdf_dir, json_dir = tmp_path / "pdf", tmp_path / "json"
+    pdf_dir.mkdir()
+    _write_pdf(pdf_dir / "undated.pdf", num_pages=2)
+
+    def extract(pdf_bytes):
+        return json.dumps({"report_date": None, "content": []})
+
+    assert pdf_extraction.extract_reports(str(pdf_dir), str(json_dir), extract_fn=extract) == []
+    assert not os.path.exists(json_dir / "undated.json")
+
+
+def test_changed_pdf_is_re_extracted_and_re_embedded(tmp_path):
+    pdf_dir, json_dir, embeddings_dir = tmp_path / "pdf", tmp_path / "json", tmp_path / "embeddings"
+    pdf_dir.mkdir()
+    version = {"text": "OLD outlook for steel demand."}
+
+    def extract(pdf_bytes):
+        return json.dumps({"report_date": "05/06/2025", "content": [{"title": "Outlook", "paragraph": version["text"]}]})
+
+    def run():
+        return pdf_extraction.run_pipeline(str(pdf_dir), str(json_dir), str(embeddings_dir), extract_fn=extract,
+                                           max_workers=1, embed_fn=lambda text: [0.1], request_delay=0)
+
+    _write_pdf(pdf_dir / "company_report_HPG.pdf", num_pages=1)
+    assert [v["id"] for v in run()] == ["company_report_HPG-0-0"]
+
+    _write_pdf(pdf_dir / "company_report_HPG.pdf", num_pages=2)
+    version["text"] = "NEW outlook for steel demand."
+    vectors = run()
+
+    assert [v["metadata"]["paragraph_text"] for v in vectors] == ["NEW outlook for steel demand."]
+    with open(embeddings_dir / "company_report_HPG-0-0.json", encoding="utf-8") as f:
+        assert json.load(f)["metadata"]["paragraph_text"] == "NEW outlook for steel demand."
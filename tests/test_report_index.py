@@ -0,0 +1,37 @@
+import json
+
+from src.report_index import read_report_sections
+
+
+def _write_report(tmp_path, content):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps({"report_date": "01/01/2025", "content": content}), encoding="utf-8")
+    return str(path)
+
+
+def test_oversized_section_can_be_read_in_full_with_offsets(tmp_path):
+    paragraph = "".join(str(i % 10) for i in range(250))
+    report_path = _write_report(tmp_path, [{"title": "Outlook", "paragraph": paragraph}])
+
+    parts, offset = [], 0
+    while True:
+        result = read_report_sections(report_path, indices=[0], offset=offset, max_bytes=100)
+        section = result["sections"][0]
+        parts.append(section["paragraph"])
+        if "next_offset" not in section:
+            break
+        assert result["truncated"]
+        offset = section["next_offset"]
+
+    assert len(parts) == 3
+    assert "".join(parts) == paragraph
+
+
+def test_sections_that_are_not_objects_are_read_as_plain_paragraphs(tmp_path):
+    report_path = _write_report(tmp_path, [{"title": "Outlook", "paragraph": "Rates hold."}, "Loose note", 42])
+
+    result = read_report_sections(report_path, indices=[0, 1, 2])
+
+    assert [(s["title"], s["paragraph"]) for s in result["sections"]] == [
+        ("Outlook", "Rates hold."), ("", "Loose note"), ("", "42")
+    ]
@@ -0,0 +1,76 @@
+import threading
+import importlib
+
+import pytest
+
+from src import config
+from src.resilience import resilient_call, DeadlineExceeded
+
+
+def _hanging_call(release: threading.Event):
+    def _call():
+        release.wait(10)
+        return "late"
+    return _call
+
+
+def test_abandoned_attempts_do_not_starve_new_calls():
+    release = threading.Event()
+    try:
+        callers = [
+            threading.Thread(target=lambda: pytest.raises(DeadlineExceeded, resilient_call, "test_hang",
+                                                          _hanging_call(release), deadline=0.2, max_attempts=1))
+            for _ in range(32)
+        ]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+
+        # 32 attempts are still hanging; a new call must still get to run
+        assert resilient_call("test_fast", lambda: "ok", deadline=1) == "ok"
+    finally:
+        release.set()
+
+
+def test_on_settled_waits_for_abandoned_attempts():
+    release, settled = threading.Event(), threading.Event()
+
+    with pytest.raises(DeadlineExceeded):
+        resilient_call("test_settle", _hanging_call(release), deadline=0.1, max_attempts=1, on_settled=settled.set)
+    assert not settled.is_set()
+
+    release.set()
+    assert settled.wait(5)
+
+
+def test_scheduler_slot_is_held_until_abandoned_attempts_finish(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_API_KEY", "test-key")
+    scheduler = importlib.import_module("src.query_engine").RequestScheduler(max_concurrency=1)
+    release, admitted = threading.Event(), threading.Event()
+
+    with pytest.raises(DeadlineExceeded):
+        scheduler.submit("slow", lambda done: resilient_call(
+            "test_scheduled", _hanging_call(release), deadline=0.1, max_attempts=1, on_settled=done
+        ), estimated_tokens=1)
+
+    def _next(done):
+        admitted.set()
+        done()
+
+    follower = threading.Thread(target=scheduler.submit, args=("next", _next, 1))
+    follower.start()
+    try:
+        assert not admitted.wait(0.3)
+    finally:
+        release.set()
+    assert admitted.wait(5)
+    follower.join()
+
+
+def test_upstream_error_is_raised_when_no_retry_fits_before_the_deadline():
+    def _unavailable():
+        raise ConnectionError("503 Service Unavailable")
+
+    with pytest.raises(ConnectionError):
+        resilient_call("test_unavailable", _unavailable, deadline=0.01, max_attempts=10)
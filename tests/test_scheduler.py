@@ -0,0 +1,116 @@
+import time
+import threading
+import importlib
+
+import pytest
+
+from src import config
+
+
+@pytest.fixture
+def query_engine(monkeypatch):
+    monkeypatch.setattr(config, "GEMINI_API_KEY", "test-key")
+    return importlib.import_module("src.query_engine")
+
+
+def _returning(value, started=None, gate=None):
+    def _fn(release):
+        if started is not None:
+            started.set()
+        if gate is not None:
+            gate.wait(5)
+        release()
+        return value
+    return _fn
+
+
+def _wait_for_queue(scheduler, size):
+    deadline = time.monotonic() + 5
+    while len(scheduler._queue) < size:
+        assert time.monotonic() < deadline, "requests were not queued"
+        time.sleep(0.01)
+
+
+def test_identical_requests_share_one_upstream_call(query_engine):
+    scheduler = query_engine.RequestScheduler()
+    started, gate = threading.Event(), threading.Event()
+    calls = []
+
+    def _call(release):
+        calls.append(1)
+        started.set()
+        gate.wait(5)
+        release()
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(scheduler.submit("same", _call, 1)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(scheduler.submit("same", _call, 1)))
+    follower.start()
+    time.sleep(0.1)
+    gate.set()
+    leader.join()
+    follower.join()
+
+    assert calls == [1]
+    assert results == ["answer", "answer"]
+
+
+def test_waiting_requests_are_served_by_priority(query_engine):
+    scheduler = query_engine.RequestScheduler(max_concurrency=1)
+    started, gate = threading.Event(), threading.Event()
+    order = []
+
+    def _recording(key):
+        def _fn(release):
+            order.append(key)
+            release()
+        return _fn
+
+    holder = threading.Thread(target=scheduler.submit, args=("holder", _returning(None, started, gate), 1))
+    holder.start()
+    assert started.wait(5)
+    waiters = []
+    for key, priority in (("background", 2), ("interactive", 0)):
+        waiter = threading.Thread(target=scheduler.submit, args=(key, _recording(key), 1), kwargs={"priority": priority})
+        waiter.start()
+        waiters.append(waiter)
+        _wait_for_queue(scheduler, len(waiters))
+    gate.set()
+    holder.join()
+    for waiter in waiters:
+        waiter.join()
+
+    assert order == ["interactive", "background"]
+
+
+def test_full_queue_is_rejected_with_a_retry_hint(query_engine):
+    scheduler = query_engine.RequestScheduler(max_concurrency=1, max_queue_size=1)
+    started, gate = threading.Event(), threading.Event()
+
+    holder = threading.Thread(target=scheduler.submit, args=("holder", _returning(None, started, gate), 1))
+    holder.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=scheduler.submit, args=("waiter", _returning(None), 1))
+    waiter.start()
+    _wait_for_queue(scheduler, 1)
+    try:
+        with pytest.raises(query_engine.SchedulerOverloaded) as overloaded:
+            scheduler.submit("rejected", _returning(None), 1)
+        assert overloaded.value.retry_after >= 1
+    finally:
+        gate.set()
+        holder.join()
+        waiter.join()
+
+
+def test_requests_wait_for_the_token_budget_to_refill(query_engine):
+    scheduler = query_engine.RequestScheduler(tokens_per_minute=6000)  # 100 tokens per second
+
+    assert scheduler.submit("first", _returning("a"), 6000) == "a"
+    started = time.monotonic()
+    assert scheduler.submit("second", _returning("b"), 50) == "b"
+
+    assert time.monotonic() - started >= 0.4
@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import vector_db
+from src.config import NAMESPACE, RRF_K
+
+
+class StubMatch(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+class StubIndex:
+    """Serves fixed matches per (namespace, query vector) and records calls."""
+
+    def __init__(self, namespaces, results=None, failing=(), name="stub-index"):
+        self.name = name
+        self.namespaces = list(namespaces)
+        self.results = results or {}
+        self.failing = set(failing)
+        self.stats_calls = 0
+        self.deleted = []
+
+    def describe_index_stats(self):
+        self.stats_calls += 1
+        return SimpleNamespace(namespaces={ns: {} for ns in self.namespaces})
+
+    def upsert(self, vectors, namespace):
+        if namespace not in self.namespaces:
+            self.namespaces.append(namespace)
+
+    def delete(self, delete_all, namespace):
+        self.deleted.append(namespace)
+        self.namespaces.remove(namespace)
+
+    def query(self, namespace, vector, top_k, include_values, include_metadata):
+        if namespace in self.failing:
+            raise ConnectionError("shard unavailable")
+        matches = self.results.get((namespace, tuple(vector)), [])[:top_k]
+        return SimpleNamespace(matches=[StubMatch(id=_id, score=score) for _id, score in matches])
+
+
+@pytest.fixture(autouse=True)
+def empty_shard_cache(monkeypatch):
+    monkeypatch.setattr(vector_db, "_shard_cache", {})
+
+
+def _ns(shard, shard_by="report_type"):
+    return f"{NAMESPACE}-{shard_by}-{shard}"
+
+
+def test_shard_list_is_cached_and_updated_on_upsert():
+    index = StubIndex([_ns("company"), "unrelated"])
+
+    assert vector_db.list_shards(index, "report_type") == [_ns("company")]
+    assert vector_db.list_shards(index, "report_type") == [_ns("company")]
+    assert index.stats_calls == 1
+
+    vector_db.upsert_sharded_vectors(index, [{"id": "a", "values": [1.0], "metadata": {"report_name": "strategy_x"}}],
+                                     shard_by="report_type")
+
+    assert vector_db.list_shards(index, "report_type") == [_ns("company"), _ns("strategy")]
+    assert index.stats_calls == 1
+
+
+def test_shards_of_a_previous_scheme_are_not_queried_and_can_be_pruned():
+    index = StubIndex([_ns("company"), _ns("company-HPG", "company"), f"{NAMESPACE}-company"])
+
+    assert vector_db.list_shards(index, "report_type") == [_ns("company")]
+    assert vector_db.delete_stale_shards(index, "report_type") == [f"{NAMESPACE}-company", _ns("company-HPG", "company")]
+    assert vector_db.list_shards(index, "report_type") == [_ns("company")]
+
+
+def test_routing_maps_report_types_and_companies_to_shards():
+    company_index = StubIndex([_ns(s, "company") for s in ("company-HPG", "company-VNM", "strategy", "economics")])
+
+    assert vector_db.route_namespaces(company_index, companies=["HPG"], shard_by="company") == [
+        _ns("company-HPG", "company")]
+    assert vector_db.route_namespaces(company_index, report_types=["company", "strategy"], shard_by="company") == [
+        _ns("company-HPG", "company"), _ns("company-VNM", "company"), _ns("strategy", "company")]
+
+    type_index = StubIndex([_ns(s) for s in ("company", "economics", "strategy")], name="type-index")
+    assert vector_db.route_namespaces(type_index, companies=["HPG"], shard_by="report_type") == [_ns("company")]
+    assert vector_db.route_namespaces(type_index, shard_by="report_type") == type_index.namespaces
+
+
+def test_shard_results_are_merged_into_a_global_top_k():
+    shards = [_ns("company"), _ns("strategy"), _ns("economics")]
+    index = StubIndex(shards, results={
+        (shards[0], (1.0,)): [("c1", 0.9), ("c2", 0.5)],
+        (shards[1], (1.0,)): [("s1", 0.8), ("s2", 0.7)],
+    }, failing=[shards[2]])
+
+    matches = vector_db.query_shards(index, [1.0], namespaces=shards, top_k=3)
+
+    assert [(m["id"], m["namespace"]) for m in matches] == [("c1", shards[0]), ("s1", shards[1]), ("s2", shards[1])]
+
+
+def test_multi_query_fuses_rankings_with_reciprocal_rank_fusion():
+    shard = _ns("company")
+    index = StubIndex([shard], results={
+        (shard, (1.0,)): [("a", 0.95), ("b", 0.90)],
+        (shard, (2.0,)): [("b", 0.80), ("c", 0.70)],
+    })
+
+    fused = vector_db.multi_query(index, [[1.0], [2.0]], namespaces=[shard], top_k=3)
+
+    # "b" ranks 2nd and 1st: its fused score beats "a", which only one reformulation found
+    assert [m["id"] for m in fused] == ["b", "a", "c"]
+    assert fused[0]["fused_score"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert fused[0]["score"] == 0.90